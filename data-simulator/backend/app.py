@@ -2,25 +2,92 @@
 Application generating real-life machine values.
 """
 
+import asyncio
+import atexit
 import warnings
 import threading
-import time
 import os
 import logging
 import random
+import signal
+import sys
 import datetime
 import re
 import json
+import types
 
 import numpy as np
 import psycopg2  # type: ignore
 import paho.mqtt.client as mqtt
-from flask import Flask, jsonify, request, abort
+from flask import Flask, Response, jsonify, request, abort, stream_with_context
 from flask_cors import CORS
 
-from database_configuration import get_db_connection  # type: ignore
-from broker_configuration import MQTT_BROKER, MQTT_PORT  # type: ignore
-from machines_configuration import MACHINE_TYPES, PARAMETER_RANGES   # type: ignore
+from backfill import timestamp_count  # type: ignore
+from backfill_jobs import BackfillJobManager, JobStateError  # type: ignore
+from deadband import DeadbandFilter  # type: ignore
+from fleet_engine import FleetEngine  # type: ignore
+from database_configuration import (  # type: ignore
+    DatabaseConnectionError,
+    db_connection,
+    wait_for_database,
+)
+from async_publisher import AsyncPublisher  # type: ignore
+from broker_configuration import (  # type: ignore
+    ASYNC_MAX_INFLIGHT,
+    ASYNC_PUBLISH_CONNECTIONS,
+    INGEST_CONNECTIONS,
+    INGEST_MODE,
+    PUBLISH_ENGINE,
+    PUBLISH_FORMAT,
+    PUBLISH_MODE,
+    get_ingest_broker,
+    get_publish_broker,
+)
+from ingest_configuration import INGEST_PERSIST  # type: ignore
+from ingest_writer import BatchWriter, create_spill_journal  # type: ignore
+from machine_registry import add_registry_listener, get_registry  # type: ignore
+from mqtt_ingest import MqttIngest, decode_message, derive_topic_filters  # type: ignore
+from past_data import (  # type: ignore
+    PAST_DATA_MIMETYPES,
+    backfill_chunk_committed,
+    generate_past_data,
+    iter_past_data,
+    parse_past_data_request,
+    run_backfill_job,
+    stream_past_data,
+)
+from payload_frames import encode_frame, to_epoch  # type: ignore
+from publish_scheduler import PublishScheduler  # type: ignore
+from sequencing import PublishSequencer, SequenceTracker, message_properties  # type: ignore
+from smoothing import SmoothingHistory, smoothing_window  # type: ignore
+from simulator_configuration import (  # type: ignore
+    CONFIG_FILE,
+    DEADBAND_INGEST_ENABLED,
+    DEADBAND_PUBLISH_ENABLED,
+    DEADBANDS,
+    DEFAULT_DEADBAND,
+    BACKFILL_JOB_DIRECTORY,
+    BACKFILL_MAX_WORKERS,
+    BACKFILL_RESUME_ON_START,
+    GENERATION_ENGINE,
+    PUBLISH_CATCH_UP,
+    PUBLISH_INTERVAL_S,
+    PUBLISH_INTERVALS,
+    PUBLISH_JITTER_S,
+    PUBLISH_LATE_TOLERANCE_S,
+    PUBLISH_PHASE_SPREAD,
+    STATE_CHECKPOINT_ENABLED,
+    STATE_CHECKPOINT_FILE,
+    STATE_CHECKPOINT_INTERVAL_S,
+    TRACE_FILE,
+    TRACE_INTERPOLATE,
+    TRACE_LOOP,
+    TRACE_OFFSET_S,
+    TRACE_TOPIC_MAP,
+)
+from state_checkpoint import StateCheckpointer, load_checkpoint  # type: ignore
+from trace_replay import TraceFile, TraceReplay  # type: ignore
+from virtual_clock import create_clock  # type: ignore
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, "app.log")
@@ -36,17 +103,34 @@ warnings.filterwarnings("ignore", category=DeprecationWarning)
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-machines = dict(MACHINE_TYPES)
-
 CLIENTS = {}
-TOPIC_UNIT_MAPPING = {}
+INGEST_CLIENTS = {}
+SHARED_PUBLISHER = None
+ASYNC_PUBLISHER = None
+MQTT_INGEST = None
+# Machine name -> read-only mapping of topic -> last value. The per-machine mappings are
+# never mutated, only replaced, so readers can use them without taking DATA_LOCK.
 DATA_STORAGE = {}
+# Serializes writers of DATA_STORAGE only.
 DATA_LOCK = threading.Lock()
-CONFIG_FILE = "config.json"
+# Parsed CONFIG_FILE and the modification time it was read at.
+CONFIG_CACHE = {"mtime": None, "config": {}}
+INGEST_WRITER = BatchWriter(journal=create_spill_journal())
+CLOCK = create_clock()
+PUBLISH_DEADBAND = DeadbandFilter(DEADBANDS, DEFAULT_DEADBAND, clock=CLOCK.monotonic)
+INGEST_DEADBAND = DeadbandFilter(DEADBANDS, DEFAULT_DEADBAND, clock=CLOCK.monotonic)
+PUBLISH_SEQUENCER = PublishSequencer()
+INGEST_TRACKER = SequenceTracker()
+FLEET_ENGINE = None
+FLEET_ENGINE_VERSION = None
+# None until first used, False if TRACE_FILE could not be opened.
+TRACE_REPLAY = None
+# Machine states loaded from the last checkpoint, consumed as machines are initialized.
+RESTORED_STATE = {}
 state = {}
 
 
-def insert_machine_data(machine_name, topic, value, unit, timestamp):
+def insert_machine_data(machine_name, topic, value, unit, timestamp, conn=None):
     """
     Insert data into the machine_data table.
     
@@ -55,67 +139,73 @@ def insert_machine_data(machine_name, topic, value, unit, timestamp):
     :param value: Value of the machine parameter.
     :param unit: Unit of the parameter.
     :param timestamp: Timestamp for when the data was generated.
+    :param conn: Connection to insert with. The insert is left uncommitted and errors
+        are raised to the caller. A pooled connection is borrowed and committed when omitted.
     """
-    conn = get_db_connection()
-    try:
+    query = """
+        INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    row = (machine_name, topic, value, unit, timestamp)
+    if conn is not None:
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (machine_name, topic, value, unit, timestamp),
-            )
-            conn.commit()
-    except psycopg2.Error as exc:
+            cur.execute(query, row)
+        return
+    try:
+        with db_connection() as pooled_conn:
+            with pooled_conn.cursor() as cur:
+                cur.execute(query, row)
+            pooled_conn.commit()
+    except (DatabaseConnectionError, psycopg2.Error) as exc:
         logging.error("Database error: %s", exc)
-    finally:
-        conn.close()
 
 
 def load_configuration():
     """
     Load configuration from a JSON file, returning a dictionary.
+
+    The parsed file is cached and only read again when its modification time changes.
+    The returned dictionary is shared and must not be modified.
     """
     try:
-        with open(CONFIG_FILE, "r", encoding='UTF-8') as file:
-            return json.load(file)
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
     except FileNotFoundError:
-        logging.warning("%s not found. Using default configuration.", CONFIG_FILE)
-        return {}
-    except json.JSONDecodeError:
+        if CONFIG_CACHE["mtime"] != "missing":
+            logging.warning("%s not found. Using default configuration.", CONFIG_FILE)
+            CONFIG_CACHE.update(mtime="missing", config={})
+        return CONFIG_CACHE["config"]
+    if mtime == CONFIG_CACHE["mtime"]:
+        return CONFIG_CACHE["config"]
+    try:
+        with open(CONFIG_FILE, "r", encoding='UTF-8') as file:
+            config = json.load(file)
+    except (OSError, json.JSONDecodeError):
         logging.error("Error decoding %s. The file might be empty or corrupted.", CONFIG_FILE)
-        return {}
-
-
-def clear_old_state():
-    """Clear any old state values before initializing new ones."""
-    global state  # pylint: disable=global-statement, global-variable-not-assigned
-    state.clear()
+        config = {}
+    CONFIG_CACHE.update(mtime=mtime, config=config)
+    return config
 
 
 def create_table_if_not_exists():
     """Create the machine_data table if it doesn't already exist."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS machine_data (
-                    id SERIAL PRIMARY KEY,
-                    machine_name VARCHAR(255),
-                    topic VARCHAR(255),
-                    value FLOAT,
-                    unit VARCHAR(50),
-                    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS machine_data (
+                        id SERIAL PRIMARY KEY,
+                        machine_name VARCHAR(255),
+                        topic VARCHAR(255),
+                        value FLOAT,
+                        unit VARCHAR(50),
+                        timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
                 )
-                """
-            )
-            conn.commit()
-    except psycopg2.Error as exc:
-        logging.error("Error creating table: %s", exc)
-    finally:
-        conn.close()
+                conn.commit()
+        except psycopg2.Error as exc:
+            logging.error("Error creating table: %s", exc)
 
 
 def initialize_data_storage():
@@ -123,43 +213,38 @@ def initialize_data_storage():
     with DATA_LOCK:
         DATA_STORAGE.update(
             {
-                machine: {
-                    item["topic"]: {"value": None, "unit": item["unit"]}
-                    for item in info.get('parameters', [])
-                }
-                for machine, info in machines.items() if isinstance(info.get('parameters'), list)
+                machine: types.MappingProxyType({
+                    item.topic: {"value": None, "unit": item.unit}
+                    for item in entry.parameters
+                })
+                for machine, entry in get_registry().machines.items()
             }
         )
 
 
-def handle_mqtt_message(_, __, msg):
-    """Handle incoming MQTT messages and store data in the database."""
-    topic = msg.topic
-    try:
-        message = float(msg.payload.decode())
-    except ValueError:
-        message = msg.payload.decode()
-
-    unit = TOPIC_UNIT_MAPPING.get(topic, "")
-
+def update_last_value(machine, topic, value, unit):
+    """Replace the last-value snapshot of a machine with one holding the new value."""
     with DATA_LOCK:
-        for machine, config in machines.items():
-            if not isinstance(config, dict) or 'parameters' not in config:
-                logging.error("Config for machine '%s' is not properly structured.", machine)
-                continue
+        values = dict(DATA_STORAGE.get(machine, {}))
+        values[topic] = {"value": value, "unit": unit}
+        DATA_STORAGE[machine] = types.MappingProxyType(values)
 
-            for item in config.get('parameters'):
-                if not isinstance(item, dict):
-                    logging.error(
-                        "Expected item to be a dictionary but got %s in machine '%s'.",
-                        type(item), machine
-                    )
-                    continue
 
-                if item.get("topic") == topic:
-                    DATA_STORAGE[machine][topic] = {"value": message, "unit": unit}
-                    insert_machine_data(machine, topic, message, unit, datetime.datetime.utcnow())
-                    break
+def handle_mqtt_message(_, __, msg):
+    """Handle incoming MQTT messages and queue their data for the database writer."""
+    registry = get_registry()
+    for row in decode_message(msg, registry, INGEST_TRACKER, clock=CLOCK.epoch):
+        machine, topic, value, unit, _ = row
+        update_last_value(machine, topic, value, unit)
+        if not INGEST_PERSIST:
+            continue
+        if DEADBAND_INGEST_ENABLED:
+            # Frame rows may carry topics missing from the topic index; those are stored as is.
+            entry = registry.lookup_topic(topic)
+            if entry is not None and not INGEST_DEADBAND.should_report(
+                    topic, entry.parameter, value):
+                continue
+        INGEST_WRITER.submit(*row)
 
 
 def is_valid_mqtt_topic(topic):
@@ -177,32 +262,101 @@ def is_valid_mqtt_topic(topic):
     return True
 
 
+def ingest_topics(machine, entry):
+    """Return the valid MQTT topics to ingest for a machine, including its frame topic."""
+    topics = []
+    for topic in [item.topic for item in entry.parameters] + [entry.frame_topic]:
+        if not is_valid_mqtt_topic(topic):
+            logging.warning(
+                "Skipping invalid MQTT topic: '%s' for machine: '%s'",
+                topic, machine
+            )
+            continue
+        topics.append(topic)
+    return topics
+
+
 def setup_mqtt_clients():
-    """Set up MQTT clients for each machine to subscribe to relevant topics."""
-    global CLIENTS  # pylint: disable=global-statement, global-variable-not-assigned
-    for machine, info in machines.items():
+    """Set up the MQTT clients used for publishing and ingesting machine data."""
+    setup_publish_clients()
+    setup_ingest_clients()
+
+
+def setup_publish_clients():
+    """Connect one shared publisher or one publishing client per machine, unless publishing with asyncio."""
+    global SHARED_PUBLISHER  # pylint: disable=global-statement
+    if PUBLISH_ENGINE in ("asyncio", "none"):
+        # The asyncio publisher and the shard launcher open their own connections.
+        return
+    broker, port = get_publish_broker()
+    registry = get_registry()
+    if PUBLISH_MODE == "shared" or any(
+            entry.template is not None for entry in registry.machines.values()):
+        # Virtual machines always publish over the shared client.
+        SHARED_PUBLISHER = mqtt.Client(client_id="simulator-publisher", protocol=mqtt.MQTTv5)
+        SHARED_PUBLISHER.connect(broker, port)
+        SHARED_PUBLISHER.loop_start()
+        logging.info("Shared publisher connected to %s:%s.", broker, port)
+    if PUBLISH_MODE == "shared":
+        return
+    for machine, entry in registry.machines.items():
+        if entry.template is not None:
+            continue
         client = mqtt.Client(client_id=machine, protocol=mqtt.MQTTv5)
+        client.connect(broker, port)
+        client.loop_start()
+        CLIENTS[machine] = client
+        logging.info("Publishing client for %s started.", machine)
+
+
+def setup_ingest_clients():
+    """Subscribe to machine topics over multiplexed or per-machine ingest connections."""
+    global MQTT_INGEST  # pylint: disable=global-statement
+    broker, port = get_ingest_broker()
+    registry = get_registry()
+    if INGEST_MODE == "multiplexed":
+        topics = [
+            topic for machine, entry in registry.machines.items()
+            for topic in ingest_topics(machine, entry)
+        ]
+        MQTT_INGEST = MqttIngest(handle_mqtt_message, broker, port, INGEST_CONNECTIONS)
+        MQTT_INGEST.start(derive_topic_filters(topics))
+        add_registry_listener(refresh_ingest_filters)
+        return
+
+    reuse_publishers = PUBLISH_MODE == "per_machine" and (broker, port) == get_publish_broker()
+    for machine, entry in registry.machines.items():
+        if entry.template is not None:
+            logging.warning("Virtual machine '%s' is only ingested in multiplexed mode.", machine)
+            continue
+        client = CLIENTS.get(machine) if reuse_publishers else None
+        if client is None:
+            client = mqtt.Client(client_id=f"{machine}-ingest", protocol=mqtt.MQTTv5)
+            client.connect(broker, port)
+            client.loop_start()
         client.on_message = handle_mqtt_message
-        client.connect(MQTT_BROKER, MQTT_PORT)
-
-        for item in info.get('parameters'):
-            topic = item["topic"]
-            if not is_valid_mqtt_topic(topic):
-                logging.warning(
-                    "Skipping invalid MQTT topic: '%s' for machine: '%s'",
-                    topic, machine
-                )
-                continue
+        for topic in ingest_topics(machine, entry):
             logging.info(
                 "Subscribing to valid topic: '%s' for machine: '%s'",
                 topic, machine
             )
             client.subscribe(topic)
-            TOPIC_UNIT_MAPPING[topic] = item["unit"]
+        INGEST_CLIENTS[machine] = client
+        logging.info("Client for %s subscribed to topics.", machine)
 
-        client.loop_start()
-        CLIENTS[machine] = client
-        logging.info("Client for %s started and subscribed to topics.", machine)
+
+def refresh_ingest_filters(registry):
+    """Extend the multiplexed ingest subscriptions to topics of a rebuilt registry."""
+    topics = [
+        topic for machine, entry in registry.machines.items()
+        for topic in ingest_topics(machine, entry)
+    ]
+    MQTT_INGEST.update_filters(derive_topic_filters(topics))
+
+
+def get_publish_client(machine):
+    """Return the MQTT client publishing data of a machine."""
+    return CLIENTS.get(machine, SHARED_PUBLISHER)
 
 
 def generate_initial_value(low, high):
@@ -212,47 +366,70 @@ def generate_initial_value(low, high):
     return initial_value
 
 
-def initialize_state(machine_type, parameter_ranges, starting_values):
-    """Initialize the state for a given machine type."""
-    clear_old_state()
+def initialize_state(machine_type, ranges, starting_values, restored=None):
+    """
+    Initialize the state of a machine type from its parameter ranges.
+
+    Parameters that already have state, or a restored checkpoint entry, keep their
+    current value and history; the others start from their starting value or midpoint.
+    """
+    previous = state.get(machine_type)
+    restored = restored or {}
     initial_values = {}
-    for param, (low, high) in parameter_ranges.get(machine_type, {}).items():
-        if param in starting_values:
-            initial_values[param] = starting_values[param]
+    history = {}
+    for param, (low, high) in ranges.items():
+        window = smoothing_window(param)
+        if previous is not None and param in previous["history"]:
+            initial_values[param] = previous["current_values"][param]
+            history[param] = SmoothingHistory.from_samples(
+                window, previous["history"][param].samples()
+            )
+        elif restored.get(param, {}).get("history"):
+            initial_values[param] = restored[param]["current"]
+            history[param] = SmoothingHistory.from_samples(window, restored[param]["history"])
         else:
-            initial_value = (low + high) / 2
-            initial_values[param] = initial_value
-            starting_values[param] = initial_value
-    history = {param: [value] * 5 for param, value in initial_values.items()}
-    state[machine_type] = {"current_values": initial_values, "history": history}
+            initial_values[param] = starting_values.get(param, (low + high) / 2)
+            history[param] = SmoothingHistory(window, initial_values[param])
+    state[machine_type] = {
+        "ranges": ranges, "current_values": initial_values, "history": history
+    }
 
 
 def generate_parameters(machine_type):
     """Generate smooth and realistic parameters for the given machine type."""
-    if machine_type not in PARAMETER_RANGES:
+    entry = get_registry().machine(machine_type)
+    if entry is None or not entry.ranges:
         logging.warning(
             "Machine type '%s' is not defined in PARAMETER_RANGES. Skipping.",
             machine_type
         )
         return {}
 
-    if machine_type not in state:
-        load_machine_state(machine_type)
-    return generate_smooth_parameters(machine_type)
+    machine_state = state.get(machine_type)
+    if machine_state is None or machine_state["ranges"] != entry.ranges:
+        load_machine_state(machine_type, entry.ranges)
+    return generate_smooth_parameters(machine_type, entry.ranges)
 
 
-def load_machine_state(machine_type):
+def load_machine_state(machine_type, ranges):
     """Load configuration and initialize the state for the machine."""
-    config = load_configuration()
-    machine_config = config.get(machine_type, {})
-    starting_values = machine_config.get("starting_values", {})
-    initialize_state(machine_type, PARAMETER_RANGES, starting_values)
+    starting_values = machine_starting_values(machine_type)
+    initialize_state(machine_type, ranges, starting_values, RESTORED_STATE.pop(machine_type, None))
+
+
+def machine_starting_values(machine_name, config=None):
+    """Return a machine's starting values from config.json over those of its registry entry."""
+    config = config if config is not None else load_configuration()
+    configured = config.get(machine_name, {}).get("starting_values", {})
+    entry = get_registry().machine(machine_name)
+    if entry is None or not entry.starting_values:
+        return configured
+    return {**entry.starting_values, **configured}
 
 
-def generate_smooth_parameters(machine_type):
+def generate_smooth_parameters(machine_type, ranges):
     """Generate parameters with smoothing applied to historical data."""
     machine_state = state[machine_type]
-    ranges = PARAMETER_RANGES[machine_type]
     parameters = {}
     for param, value_range in ranges.items():
         parameters[param] = calculate_smoothed_value(param, value_range, machine_state)
@@ -267,163 +444,192 @@ def calculate_smoothed_value(param, value_range, machine_state):
     change = random.uniform(-0.07, 0.07) * current_value
     new_value = max(min(current_value + change, high), low)
     update_parameter_history(param, new_value, machine_state)
-    return smooth_history_values(param, machine_state["history"][param], current_value)
+    return smooth_history_values(param, machine_state["history"][param])
 
 
 def update_parameter_history(param, new_value, machine_state):
-    """Update the historical values for a parameter."""
-    history = machine_state["history"][param]
-    history.append(new_value)
-    if len(history) > 5:
-        history.pop(0)
+    """Push a new value into the ring-buffer history of a parameter."""
+    machine_state["history"][param].push(new_value)
 
 
-def smooth_history_values(_, history, default_value):
-    """Apply smoothing to the historical values of a parameter."""
-    valid_history = [h for h in history if isinstance(h, (int, float))]
-    if not valid_history:
-        return default_value
-    history_np = np.array(valid_history, dtype=np.float64)
-    weights = np.linspace(1, 2, len(history_np), dtype=np.float64)
-    smoothed_value = np.average(history_np, weights=weights)
-    return round(smoothed_value, 2)
+def smooth_history_values(_, history):
+    """Return the weighted average of a parameter's history, rounded to two decimals."""
+    return round(history.smoothed(), 2)
 
 
-def generate_past_data(machine_name, start_time, end_time, interval_seconds=60):
-    """
-    Generate machine data for the specified machine within a date range in the past and log it.
-
-    :param machine_name: Name of the machine.
-    :param start_time: Start datetime for data generation.
-    :param end_time: End datetime for data generation.
-    :param interval_seconds: Interval in seconds between data points.
-    :return: List of generated data entries.
-    """
-    conn = get_db_connection()
-    generated_data = []
-
-    try:
-        current_time = start_time
-        while current_time <= end_time:
-            parameters = generate_parameters(machine_name)
-            generated_data.extend(
-                process_parameters_and_store(machine_name, parameters, current_time)
-            )
-            current_time += datetime.timedelta(seconds=interval_seconds)
-        conn.commit()
-        logging.info(
-            "Generated past data for %s from %s to %s",
-            machine_name, start_time, end_time
+def get_fleet_engine():
+    """Return the fleet engine of the current registry, rebuilding it after configuration changes."""
+    global FLEET_ENGINE, FLEET_ENGINE_VERSION  # pylint: disable=global-statement
+    registry = get_registry()
+    if FLEET_ENGINE is None or FLEET_ENGINE_VERSION != registry.version:
+        config = load_configuration()
+        engine = FleetEngine(
+            (name, entry.ranges, machine_starting_values(name, config))
+            for name, entry in registry.machines.items() if entry.ranges
         )
-    except psycopg2.Error as exc:
-        logging.error("Error generating past data: %s", exc)
-    finally:
-        conn.close()
-    return generated_data
-
+        if FLEET_ENGINE is not None:
+            engine.carry_over(FLEET_ENGINE)
+        elif RESTORED_STATE:
+            engine.restore_state(RESTORED_STATE)
+            RESTORED_STATE.clear()
+        FLEET_ENGINE, FLEET_ENGINE_VERSION = engine, registry.version
+        logging.info("Fleet engine built with %d parameters.", len(engine))
+    return FLEET_ENGINE
+
+
+def get_trace_replay():
+    """Return the replay of TRACE_FILE, opening it on first use; None if it cannot be read."""
+    global TRACE_REPLAY  # pylint: disable=global-statement
+    if TRACE_REPLAY is None:
+        try:
+            TRACE_REPLAY = TraceReplay(
+                TraceFile(TRACE_FILE), TRACE_OFFSET_S, TRACE_LOOP, TRACE_INTERPOLATE,
+                TRACE_TOPIC_MAP,
+            )
+        except (OSError, ValueError) as exc:
+            logging.error("Could not open trace %s: %s", TRACE_FILE, exc)
+            TRACE_REPLAY = False
+    return TRACE_REPLAY or None
+
+
+def overlay_trace(parameters, machines):
+    """Replace generated parameters of the given machines by traced values in trace mode."""
+    replay = get_trace_replay() if GENERATION_ENGINE == "trace" else None
+    if replay is None:
+        return parameters
+    for machine, values in replay.values(get_registry(), machines, CLOCK.monotonic()).items():
+        parameters.setdefault(machine, {}).update(values)
+    return parameters
 
-def process_parameters_and_store(machine_name, parameters, current_time):
-    """Process parameters and insert the data into the database."""
-    data_entries = []
 
-    for parameter, value in parameters.items():
-        topic, unit = get_topic_and_unit(machine_name, parameter)
-        if topic:
-            value = validate_and_convert_value(machine_name, parameter, value)
-            data_entry = {
-                "machine_name": machine_name,
-                "topic": topic,
-                "parameter": parameter,
-                "value": value,
-                "unit": unit,
-                "timestamp": current_time.isoformat(),
+def generate_fleet_parameters(machines=None):
+    """Generate one tick of parameters for the given machines (default all), keyed by name."""
+    if machines is None:
+        machines = list(get_registry().machines)
+    if GENERATION_ENGINE in ("vectorized", "trace"):
+        return overlay_trace(get_fleet_engine().step_machines(machines), machines)
+    return {machine: generate_parameters(machine) for machine in machines}
+
+
+def snapshot_state():
+    """Return the current values and smoothing histories of every generated parameter."""
+    if GENERATION_ENGINE in ("vectorized", "trace"):
+        return FLEET_ENGINE.export_state() if FLEET_ENGINE is not None else {}
+    return {
+        machine: {
+            param: {
+                "current": float(machine_state["current_values"][param]),
+                "history": [float(sample) for sample in history.samples()],
             }
-            data_entries.append(data_entry)
-            print(f"Generated data entry: {data_entry}")
-            insert_machine_data(machine_name, topic, value, unit, current_time)
-    return data_entries
+            for param, history in machine_state["history"].items()
+        }
+        for machine, machine_state in list(state.items())
+    }
 
 
-def get_topic_and_unit(machine_name, parameter):
-    """Retrieve the topic and unit for a given parameter of a machine."""
-    for item in machines[machine_name]['parameters']:
-        if item['parameter'] == parameter:
-            return item['topic'], item['unit']
-    return None, None
+def publish_interval(machine):
+    """Return the publish interval of a machine in seconds."""
+    if machine in PUBLISH_INTERVALS:
+        return PUBLISH_INTERVALS[machine]
+    entry = get_registry().machine(machine)
+    if entry is not None and entry.template in PUBLISH_INTERVALS:
+        return PUBLISH_INTERVALS[entry.template]
+    return PUBLISH_INTERVAL_S
 
 
-def validate_and_convert_value(machine_name, parameter, value):
-    """Validate and convert the value for a parameter."""
-    if isinstance(value, (np.float64, np.float32)):
-        value = float(value)
+def create_publish_scheduler(clock):
+    """Create a publish scheduler running on a virtual clock."""
+    return PublishScheduler(
+        publish_interval, PUBLISH_PHASE_SPREAD, PUBLISH_JITTER_S, PUBLISH_CATCH_UP,
+        PUBLISH_LATE_TOLERANCE_S, clock=clock.monotonic, sleep=clock.sleep, wait=clock.wait,
+    )
 
-    if value is None or value == "":
-        logging.warning(
-            "Empty value detected for parameter '%s' in machine '%s'. "
-            "Using default value 0.0.",
-            parameter, machine_name
-        )
-        value = 0.0
 
-    return value
+PUBLISH_SCHEDULER = create_publish_scheduler(CLOCK)
 
 
-def publish_data():
-    """Publish generated data to MQTT topics."""
-    while True:
-        for machine, config in machines.items():
-            if not validate_machine_config(machine, config):
-                continue
+def run_async_publisher(checkpointer=None):
+    """Run the asyncio publisher on the calling thread until the process exits."""
+    global ASYNC_PUBLISHER  # pylint: disable=global-statement
+    broker, port = get_publish_broker()
+    ASYNC_PUBLISHER = AsyncPublisher(
+        PUBLISH_SCHEDULER, get_registry, generate_fleet_parameters, publish_machine_data,
+        broker, port, ASYNC_PUBLISH_CONNECTIONS, ASYNC_MAX_INFLIGHT,
+        on_tick=checkpointer.maybe_save if checkpointer is not None else None,
+        real_seconds=CLOCK.real_seconds, message_count=tick_message_count,
+    )
+    asyncio.run(ASYNC_PUBLISHER.run())
 
-            client = CLIENTS.get(machine)
-            parameters_list = config.get('parameters')
-            parameters = generate_parameters(machine)
 
-            publish_machine_data(machine, parameters, parameters_list, client)
+def publish_data(checkpointer=None):
+    """Publish generated data to MQTT topics as machines come due on the publish scheduler."""
+    registry_version = None
+    while True:
+        registry = get_registry()
+        if registry.version != registry_version:
+            PUBLISH_SCHEDULER.sync(registry.machines)
+            registry_version = registry.version
+        due = PUBLISH_SCHEDULER.wait_due()
+        for machine, parameters in generate_fleet_parameters(due).items():
+            publish_machine_data(machine, parameters, get_publish_client(machine))
+        if checkpointer is not None:
+            checkpointer.maybe_save()
 
-        time.sleep(15)
 
+def tick_message_count(parameters):
+    """Return the number of messages publish_machine_data sends at most for a tick."""
+    return 1 if PUBLISH_FORMAT != "legacy" else len(parameters)
 
-def validate_machine_config(machine, config):
-    """Validate the machine configuration to ensure it's a dictionary with a parameters key."""
-    if not isinstance(config, dict):
-        logging.error(
-            "Config for machine '%s' is not a dictionary: %s",
-            machine, type(config)
-        )
-        return False
 
-    parameters_list = config.get('parameters')
-    if not isinstance(parameters_list, list):
-        logging.error(
-            "'parameters' for machine '%s' is not a list: %s",
-            machine, type(parameters_list)
-        )
-        return False
+def publish_machine_data(machine, parameters, client):
+    """
+    Publish data for a single machine, as a frame or one message per parameter.
 
-    return True
+    Every message carries the generation timestamp and a per-topic sequence number,
+    embedded in frames and as MQTTv5 user properties next to legacy bare values.
+    """
+    registry = get_registry()
+    generated_at = CLOCK.now()
+    if DEADBAND_PUBLISH_ENABLED:
+        parameters = report_by_exception(PUBLISH_DEADBAND, machine, parameters)
+    if PUBLISH_FORMAT != "legacy":
+        entry = registry.machine(machine)
+        if client and entry is not None and parameters:
+            payload = encode_frame(
+                entry, parameters, generated_at, PUBLISH_FORMAT,
+                PUBLISH_SEQUENCER.next(entry.frame_topic),
+            )
+            client.publish(entry.frame_topic, payload)
+            logging.info(
+                "Published %s frame to topic '%s' for machine '%s'",
+                PUBLISH_FORMAT, entry.frame_topic, machine
+            )
+        return
+    for parameter, value in parameters.items():
+        entry = registry.lookup_parameter(machine, parameter)
+        if entry is None:
+            continue
+        topic = entry.topic
+        if client and topic:
+            properties = message_properties(
+                to_epoch(generated_at), PUBLISH_SEQUENCER.next(topic), PUBLISH_SEQUENCER.session
+            )
+            client.publish(topic, value, properties=properties)
+            logging.info(
+                "Published to topic '%s' with value '%s' for machine '%s'",
+                topic, value, machine
+            )
 
 
-def publish_machine_data(machine, parameters, parameters_list, client):
-    """Publish data for a single machine."""
+def report_by_exception(deadband_filter, machine, parameters):
+    """Return the parameters whose values left their deadband or hit their heartbeat."""
+    registry = get_registry()
+    reported = {}
     for parameter, value in parameters.items():
-        for item in parameters_list:
-            if not isinstance(item, dict):
-                logging.error(
-                    "Item in parameters for machine '%s' is not a dict: %s",
-                    machine, type(item)
-                )
-                continue
-
-            if item.get("parameter") == parameter:
-                topic = item.get("topic")
-                if client and topic:
-                    client.publish(topic, value)
-                    logging.info(
-                        "Published to topic '%s' with value '%s' for machine '%s'",
-                        topic, value, machine
-                    )
-                break
+        entry = registry.lookup_parameter(machine, parameter)
+        if entry is None or deadband_filter.should_report(entry.topic, parameter, value):
+            reported[parameter] = value
+    return reported
 
 
 @app.route("/")
@@ -436,34 +642,20 @@ def index():
 def get_machines():
     """Return a list of machines and their current parameters."""
     result = []
-    with DATA_LOCK:
-        for machine, config in machines.items():
-            machine_data = {"name": machine, "parameters": []}
-            parameters = config.get('parameters')
-            if not isinstance(parameters, list):
-                logging.error(
-                    "Parameters for machine '%s' is not a list: %s",
-                    machine, type(parameters)
+    for machine, entry in get_registry().machines.items():
+        machine_data = {"name": machine, "parameters": []}
+        values = DATA_STORAGE.get(machine, {})
+        for item in entry.parameters:
+            last_value = values.get(item.topic)
+            if last_value is not None:
+                machine_data["parameters"].append(
+                    {
+                        "parameter": item.parameter,
+                        "value": last_value["value"],
+                        "unit": last_value["unit"],
+                    }
                 )
-                continue
-
-            for item in parameters:
-                if not isinstance(item, dict):
-                    logging.error(
-                        "Expected item to be a dictionary but got %s in machine '%s'.",
-                        type(item), machine
-                    )
-                    continue
-                topic = item.get("topic")
-                if topic in DATA_STORAGE.get(machine, {}):
-                    machine_data["parameters"].append(
-                        {
-                            "parameter": item.get("parameter"),
-                            "value": DATA_STORAGE[machine][topic]["value"],
-                            "unit": DATA_STORAGE[machine][topic]["unit"],
-                        }
-                    )
-            result.append(machine_data)
+        result.append(machine_data)
     return jsonify(result)
 
 
@@ -482,20 +674,20 @@ def get_machine_data():
     except ValueError:
         abort(400, description="Invalid lookback_minutes value")
 
-    start_time = datetime.datetime.utcnow() - datetime.timedelta(minutes=lookback_minutes)
+    start_time = CLOCK.now() - datetime.timedelta(minutes=lookback_minutes)
 
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT topic, value, unit, timestamp FROM machine_data
-                WHERE machine_name = %s AND timestamp >= %s
-                ORDER BY timestamp ASC
-                """,
-                (requested_machine_name, start_time),
-            )
-            rows = cur.fetchall()
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT topic, value, unit, timestamp FROM machine_data
+                    WHERE machine_name = %s AND timestamp >= %s
+                    ORDER BY timestamp ASC
+                    """,
+                    (requested_machine_name, start_time),
+                )
+                rows = cur.fetchall()
 
         result = {}
         for row in rows:
@@ -506,39 +698,153 @@ def get_machine_data():
             result[topic]["values"].append(value)
 
         return jsonify(result)
+    except DatabaseConnectionError as exc:
+        logging.error("Database unavailable while fetching machine data: %s", exc)
+        return jsonify({"error": str(exc)}), 503
     except psycopg2.Error as exc:
         logging.error("Error fetching machine data: %s", exc)
         return jsonify({"error": str(exc)}), 500
-    finally:
-        conn.close()
+
+
+@app.route("/ingest-stats", methods=["GET"])
+def get_ingest_stats():
+    """Return batch size and flush latency statistics of the ingest writer."""
+    return jsonify(INGEST_WRITER.stats())
+
+
+@app.route("/deadband-stats", methods=["GET"])
+def get_deadband_stats():
+    """Return how many values the publish and ingest deadbands suppressed."""
+    return jsonify({
+        "publish": dict(PUBLISH_DEADBAND.stats(), enabled=DEADBAND_PUBLISH_ENABLED),
+        "ingest": dict(INGEST_DEADBAND.stats(), enabled=DEADBAND_INGEST_ENABLED),
+    })
+
+
+@app.route("/ingest-lag", methods=["GET"])
+def get_ingest_lag():
+    """
+    Return the ingest lag distribution and per-topic sequence gap/duplicate/reorder counters.
+
+    Per-topic counters are included with ``?per_topic=true``.
+    """
+    include_topics = request.args.get("per_topic", "false").lower() == "true"
+    return jsonify(INGEST_TRACKER.stats(include_topics))
+
+
+@app.route("/publish-stats", methods=["GET"])
+def get_publish_stats():
+    """Return publish tick counts, lateness and missed deadlines of the scheduler."""
+    stats = PUBLISH_SCHEDULER.stats()
+    if ASYNC_PUBLISHER is not None:
+        stats["async"] = ASYNC_PUBLISHER.stats()
+    return jsonify(stats)
 
 
 @app.route("/generate-past-data", methods=["POST"])
 def generate_past_data_endpoint():
     """
     Endpoint to generate data for a machine in a specified date range in the past and return it.
+
+    With "format" set to "ndjson" or "csv" the rows are streamed chunk by chunk instead
+    of being returned in a single JSON document.
     """
     data = request.json
-    machine_name = data.get("machine_name")
-    start_date = data.get("start_date")
-    end_date = data.get("end_date")
-    interval_seconds = data.get("interval_seconds", 60)
+    try:
+        machine_name, start_time, end_time, interval_seconds = parse_past_data_request(data)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
 
-    if not machine_name or not start_date or not end_date:
-        return jsonify({"error": "Missing required parameters"}), 400
+    output_format = data.get("format", "json")
+    if output_format not in PAST_DATA_MIMETYPES:
+        return jsonify({"error": f"Unknown format '{output_format}'"}), 400
 
+    starting_values = machine_starting_values(machine_name)
     try:
-        start_time = datetime.datetime.fromisoformat(start_date)
-        end_time = datetime.datetime.fromisoformat(end_date)
-    except ValueError:
-        return jsonify({"error": "Invalid date format"}), 400
+        if output_format != "json":
+            chunks = iter_past_data(
+                machine_name, start_time, end_time, interval_seconds, starting_values
+            )
+            # Take the first chunk here, so an unavailable database is still reported as 503.
+            first_rows = next(chunks, None)
+            return Response(
+                stream_with_context(stream_past_data(chunks, first_rows, output_format)),
+                mimetype=PAST_DATA_MIMETYPES[output_format],
+            )
+        generated_data = generate_past_data(
+            machine_name, start_time, end_time, interval_seconds, starting_values
+        )
+    except DatabaseConnectionError as exc:
+        logging.error("Database unavailable while generating past data: %s", exc)
+        return jsonify({"error": str(exc)}), 503
+    except psycopg2.Error as exc:
+        logging.error("Error generating past data: %s", exc)
+        return jsonify({"error": str(exc)}), 500
 
-    if start_time >= end_time:
-        return jsonify({"error": "Start date must be before end date"}), 400
+    return jsonify({"message": "Data generation complete", "generated_data": generated_data}), 200
 
-    generated_data = generate_past_data(machine_name, start_time, end_time, interval_seconds)
 
-    return jsonify({"message": "Data generation complete", "generated_data": generated_data}), 200
+BACKFILL_JOBS = BackfillJobManager(
+    lambda job: run_backfill_job(job, machine_starting_values(job.machine_name)),
+    backfill_chunk_committed, BACKFILL_JOB_DIRECTORY, BACKFILL_MAX_WORKERS,
+)
+
+
+@app.route("/backfill-jobs", methods=["POST"])
+def create_backfill_job():
+    """Start generating past data for a machine in the background and return the job."""
+    try:
+        machine_name, start_time, end_time, interval_seconds = parse_past_data_request(
+            request.json
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    entry = get_registry().machine(machine_name)
+    if entry is None or not entry.ranges:
+        return jsonify({"error": f"Unknown machine '{machine_name}'"}), 404
+    rows_total = timestamp_count(start_time, end_time, interval_seconds) * sum(
+        1 for parameter in entry.ranges if get_registry().lookup_parameter(machine_name, parameter)
+    )
+    job = BACKFILL_JOBS.submit(machine_name, start_time, end_time, interval_seconds, rows_total)
+    return jsonify(job.progress()), 202
+
+
+@app.route("/backfill-jobs", methods=["GET"])
+def list_backfill_jobs():
+    """Return every backfill job with its progress."""
+    return jsonify([job.progress() for job in BACKFILL_JOBS.jobs()])
+
+
+@app.route("/backfill-jobs/<job_id>", methods=["GET"])
+def get_backfill_job(job_id):
+    """Return the progress of a backfill job: rows done, rate and ETA."""
+    job = BACKFILL_JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify(job.progress())
+
+
+@app.route("/backfill-jobs/<job_id>/cancel", methods=["POST"])
+def cancel_backfill_job(job_id):
+    """Stop a backfill job after its current chunk."""
+    return change_backfill_job(BACKFILL_JOBS.cancel, job_id)
+
+
+@app.route("/backfill-jobs/<job_id>/resume", methods=["POST"])
+def resume_backfill_job(job_id):
+    """Resume an interrupted or failed backfill job from its last committed chunk."""
+    return change_backfill_job(BACKFILL_JOBS.resume, job_id)
+
+
+def change_backfill_job(action, job_id):
+    """Apply cancel or resume to a job and return its progress or the error."""
+    try:
+        job = action(job_id)
+    except KeyError:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    except JobStateError as exc:
+        return jsonify({"error": str(exc)}), 409
+    return jsonify(job.progress())
 
 
 def run_server():
@@ -547,8 +853,25 @@ def run_server():
 
 
 if __name__ == "__main__":
+    wait_for_database()
     create_table_if_not_exists()
     initialize_data_storage()
+    if INGEST_PERSIST:
+        INGEST_WRITER.start()
+        atexit.register(INGEST_WRITER.stop)
+    BACKFILL_JOBS.recover(resume=BACKFILL_RESUME_ON_START)
+    atexit.register(BACKFILL_JOBS.shutdown)
+    # Exit through SystemExit on SIGTERM too, so that the atexit handlers run.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     setup_mqtt_clients()
-    threading.Thread(target=publish_data, daemon=True).start()
+    CHECKPOINTER = None
+    if STATE_CHECKPOINT_ENABLED:
+        RESTORED_STATE.update(load_checkpoint(STATE_CHECKPOINT_FILE))
+        CHECKPOINTER = StateCheckpointer(
+            STATE_CHECKPOINT_FILE, STATE_CHECKPOINT_INTERVAL_S, snapshot_state
+        )
+        atexit.register(CHECKPOINTER.save)
+    if PUBLISH_ENGINE != "none":
+        publisher = run_async_publisher if PUBLISH_ENGINE == "asyncio" else publish_data
+        threading.Thread(target=publisher, args=(CHECKPOINTER,), daemon=True).start()
     run_server()
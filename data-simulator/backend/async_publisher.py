@@ -0,0 +1,219 @@
+"""
+Publishing for very large fleets from a single asyncio event loop.
+
+A few paho clients are driven by the loop through paho's socket callbacks rather than
+their own network threads: the loop reads and writes their sockets and calls
+loop_misc() once a second. Machines are assigned to a connection by a stable hash of
+their name. Ticks come from a PublishScheduler, and each due machine is published by
+its own short-lived task. A connection holds at most ``max_inflight`` messages that
+have not been written (QoS 0) or acknowledged (QoS 1/2); a tick waits until the window
+has room for all of its messages instead of queuing without bound in paho. Blocking
+(re)connects run on the loop's default executor. The thread count stays the same
+whatever the fleet size.
+"""
+
+import asyncio
+import logging
+import threading
+import zlib
+
+import paho.mqtt.client as mqtt
+
+MISC_INTERVAL_S = 1.0
+RECONNECT_DELAY_S = 5.0
+
+
+class AsyncioMqttConnection:
+    """
+    One paho client whose network I/O runs on an asyncio loop, with an in-flight window.
+
+    Instances offer the paho ``publish`` signature so that publish_machine_data can
+    use them like a client, after the caller has awaited ``wait_for_window`` for the
+    number of messages it is about to publish.
+    """
+
+    def __init__(self, client_id, broker, port, max_inflight):
+        self.broker = broker
+        self.port = port
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.published = 0
+        self._loop = None
+        self._loop_thread = None
+        self._room = None
+        self._client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
+        self._client.max_inflight_messages_set(max_inflight)
+        self._client.max_queued_messages_set(0)
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+        self._client.on_publish = self._on_publish
+        self._misc_task = None
+
+    async def connect(self):
+        """Connect to the broker and start the housekeeping task."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._room = asyncio.Event()
+        self._room.set()
+        self._client.connect_async(self.broker, self.port)
+        try:
+            await self._loop.run_in_executor(None, self._client.reconnect)
+        except OSError as exc:
+            logging.error("Async publisher could not connect to %s:%s: %s", self.broker, self.port, exc)
+        self._misc_task = asyncio.create_task(self._misc())
+
+    async def wait_for_window(self, messages=1):
+        """
+        Wait until the in-flight window has room for a number of messages.
+
+        A tick of more messages than the whole window waits for the window to drain.
+        """
+        while self.inflight and self.inflight + messages > self.max_inflight:
+            self._room.clear()
+            await self._room.wait()
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        """Hand a message to paho; it holds a window slot until it is written or acked."""
+        # Counted first: paho may write the message and call on_publish before returning.
+        self.inflight += 1
+        info = self._client.publish(topic, payload, qos, retain, properties)
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self._release()
+            logging.warning("Publishing to '%s' failed: %s", topic, mqtt.error_string(info.rc))
+        return info
+
+    async def close(self):
+        """Disconnect and stop the housekeeping task."""
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+        self._client.disconnect()
+
+    def _release(self):
+        """Free a window slot and wake ticks waiting for one."""
+        self.inflight = max(0, self.inflight - 1)
+        if self.inflight < self.max_inflight:
+            self._room.set()
+
+    def _on_publish(self, _client, _userdata, _mid):
+        """paho callback: a message has been written (QoS 0) or acknowledged."""
+        self.published += 1
+        self._release()
+
+    def _call_on_loop(self, callback, *args):
+        """Call a loop method from a paho callback, which runs in the executor on reconnect."""
+        if threading.get_ident() == self._loop_thread:
+            callback(*args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _on_socket_open(self, client, _userdata, sock):
+        self._call_on_loop(self._loop.add_reader, sock.fileno(), client.loop_read)
+
+    def _on_socket_close(self, _client, _userdata, sock):
+        self._call_on_loop(self._loop.remove_reader, sock.fileno())
+
+    def _on_socket_register_write(self, client, _userdata, sock):
+        self._call_on_loop(self._loop.add_writer, sock.fileno(), client.loop_write)
+
+    def _on_socket_unregister_write(self, _client, _userdata, sock):
+        self._call_on_loop(self._loop.remove_writer, sock.fileno())
+
+    async def _misc(self):
+        """Run paho's keepalive handling and reconnect after a lost connection."""
+        while True:
+            await asyncio.sleep(MISC_INTERVAL_S)
+            if self._client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                try:
+                    await self._loop.run_in_executor(None, self._client.reconnect)
+                    logging.info("Async publisher reconnected to %s:%s.", self.broker, self.port)
+                except OSError as exc:
+                    logging.error("Async publisher reconnect failed: %s", exc)
+                    await asyncio.sleep(RECONNECT_DELAY_S)
+
+
+class AsyncPublisher:
+    """
+    Publishes scheduled machine ticks over a small pool of asyncio-driven connections.
+
+    :param scheduler: PublishScheduler deciding when each machine publishes.
+    :param registry: Callable returning the current MachineRegistry; the schedule is
+        synchronized with its machines whenever its version changes.
+    :param generate: Callable taking due machine names and returning {machine: parameters}.
+    :param publish: Callable (machine, parameters, client) publishing one machine's tick.
+    :param message_count: Optional callable taking a tick's parameters and returning how
+        many messages ``publish`` sends for it; defaults to one per parameter.
+    :param on_tick: Optional callable invoked after every batch of due machines.
+    :param real_seconds: Callable converting the scheduler's seconds into real seconds,
+        for schedulers running on a virtual clock.
+    """
+
+    def __init__(self, scheduler, registry, generate, publish,
+                 broker, port, connections, max_inflight, on_tick=None,
+                 real_seconds=None, message_count=len):
+        self.scheduler = scheduler
+        self.registry = registry
+        self.generate = generate
+        self.publish = publish
+        self.message_count = message_count
+        self.on_tick = on_tick
+        self.real_seconds = real_seconds or (lambda seconds: seconds)
+        self.connections = [
+            AsyncioMqttConnection(f"simulator-async-{index}", broker, port, max_inflight)
+            for index in range(connections)
+        ]
+        self._tasks = set()
+
+    def connection_for(self, machine):
+        """Return the connection a machine always publishes on."""
+        return self.connections[zlib.crc32(machine.encode("utf-8")) % len(self.connections)]
+
+    async def run(self, stop_event=None):
+        """Publish scheduled ticks until ``stop_event`` (an asyncio.Event) is set."""
+        for connection in self.connections:
+            await connection.connect()
+        logging.info("Async publisher running with %d connections.", len(self.connections))
+        registry_version = None
+        try:
+            while stop_event is None or not stop_event.is_set():
+                registry = self.registry()
+                if registry.version != registry_version:
+                    self.scheduler.sync(registry.machines)
+                    registry_version = registry.version
+                delay = self.scheduler.next_delay()
+                if delay is None or delay > 0:
+                    delay = self.real_seconds(delay) if delay is not None else 1.0
+                    await asyncio.sleep(min(delay, 1.0))
+                    continue
+                due = self.scheduler.pop_due()
+                for machine, parameters in self.generate(due).items():
+                    task = asyncio.create_task(self._publish_machine(machine, parameters))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                if self.on_tick is not None:
+                    self.on_tick()
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            for connection in self.connections:
+                await connection.close()
+
+    def stats(self):
+        """Return per-connection in-flight and published counts."""
+        return {
+            "tasks": len(self._tasks),
+            "connections": [
+                {"inflight": connection.inflight, "published": connection.published}
+                for connection in self.connections
+            ],
+        }
+
+    async def _publish_machine(self, machine, parameters):
+        """Wait for room for every message of a tick on the machine's connection and publish it."""
+        connection = self.connection_for(machine)
+        await connection.wait_for_window(self.message_count(parameters))
+        try:
+            self.publish(machine, parameters, connection)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logging.error("Async publish for machine '%s' failed: %s", machine, exc)
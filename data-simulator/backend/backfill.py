@@ -0,0 +1,88 @@
+"""
+Vectorized generation of past machine data.
+
+A backfill produces the same series as calling generate_parameters once per timestamp,
+but a whole chunk of timestamps at a time. Every raw value is a uniform +/-7 % step
+around the parameter's anchor (its starting value), clipped to its range. Because
+each step depends only on the anchor, a chunk of raw values is one NumPy draw. The
+smoothing is a correlation with linspace(1, 2, window) weights, and the last
+``window - 1`` raw values of a chunk carry over to the next one.
+"""
+
+import collections
+
+import numpy as np
+
+from fleet_engine import STEP_FRACTION  # type: ignore
+from simulator_configuration import BACKFILL_CHUNK_SIZE  # type: ignore
+from smoothing import smoothing_window  # type: ignore
+
+# Decimals generated values are rounded to, and the matching COPY format of the values.
+VALUE_DECIMALS = 2
+COPY_VALUE_FORMAT = f"%.{VALUE_DECIMALS}f"
+
+# timestamps: datetime64[us] array of length n; parameters: parameter names in column
+# order; values: float64 array of shape (n, len(parameters)).
+BackfillChunk = collections.namedtuple("BackfillChunk", ["timestamps", "parameters", "values"])
+
+
+class MachineBackfill:
+    """
+    Generates smoothed values of every parameter of one machine, chunk after chunk.
+
+    :param ranges: Mapping of parameter name to (low, high).
+    :param starting_values: Mapping of parameter name to starting value; parameters
+        without one start at the midpoint of their range.
+    :param rng: numpy.random.Generator used for the steps.
+    """
+
+    def __init__(self, ranges, starting_values, rng=None, window_for=smoothing_window):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.parameters = list(ranges)
+        self.low = np.asarray([low for low, _ in ranges.values()], dtype=np.float64)
+        self.high = np.asarray([high for _, high in ranges.values()], dtype=np.float64)
+        anchors = [
+            starting_values.get(parameter, (low + high) / 2)
+            for parameter, (low, high) in ranges.items()
+        ]
+        self.anchor = np.clip(np.asarray(anchors, dtype=np.float64), self.low, self.high)
+        self.weights = [np.linspace(1, 2, window_for(parameter)) for parameter in self.parameters]
+        self._tails = [
+            np.full(len(weights) - 1, anchor) for weights, anchor in zip(self.weights, self.anchor)
+        ]
+
+    def generate(self, count):
+        """Return the next ``count`` smoothed values as an array of shape (count, parameters)."""
+        steps = self.rng.uniform(-STEP_FRACTION, STEP_FRACTION, (count, len(self.parameters)))
+        raw = np.clip(self.anchor * (1.0 + steps), self.low, self.high)
+        smoothed = np.empty_like(raw)
+        for column, weights in enumerate(self.weights):
+            series = np.concatenate((self._tails[column], raw[:, column]))
+            smoothed[:, column] = np.correlate(series, weights, "valid") / weights.sum()
+            self._tails[column] = series[len(series) - len(weights) + 1:]
+        return np.round(smoothed, VALUE_DECIMALS)
+
+
+def timestamp_count(start_time, end_time, interval_seconds):
+    """Return the number of timestamps from start_time to end_time inclusive."""
+    if interval_seconds <= 0:
+        raise ValueError("Interval must be positive.")
+    span = (end_time - start_time).total_seconds()
+    return int(span // interval_seconds) + 1 if span >= 0 else 0
+
+
+def iter_backfill_chunks(ranges, starting_values, start_time, end_time, interval_seconds,
+                         chunk_size=BACKFILL_CHUNK_SIZE, rng=None):
+    """
+    Yield BackfillChunks covering start_time to end_time inclusive every interval_seconds.
+
+    Only one chunk of timestamps and values is held in memory at a time.
+    """
+    backfill = MachineBackfill(ranges, starting_values, rng)
+    total = timestamp_count(start_time, end_time, interval_seconds)
+    start = np.datetime64(start_time, "us")
+    step = np.timedelta64(round(interval_seconds * 1_000_000), "us")
+    for offset in range(0, total, chunk_size):
+        count = min(chunk_size, total - offset)
+        timestamps = start + step * np.arange(offset, offset + count)
+        yield BackfillChunk(timestamps, backfill.parameters, backfill.generate(count))
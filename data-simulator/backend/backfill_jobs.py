@@ -0,0 +1,310 @@
+"""
+Background backfill jobs with progress, cancellation and resume.
+
+A job generates and stores past data for one machine on a bounded thread pool, one
+chunk at a time. Every job is persisted as ``<job id>.json`` in the job directory.
+Before a chunk is committed, the job is saved with the chunk as ``pending``; after
+the commit, with the chunk's end as its new resume point. A job interrupted between
+the two asks the database whether its pending chunk was committed before it
+continues, so resuming never stores a chunk twice.
+
+Jobs run on daemon threads rather than a ThreadPoolExecutor, whose workers the
+interpreter joins before atexit handlers run: shutdown() registered with atexit can
+then still stop running jobs after their current chunk and leave them interrupted.
+"""
+
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobStateError(ValueError):
+    """Exception raised when a job cannot be cancelled or resumed in its current state."""
+
+
+class BackfillJob:
+    """State and progress of one backfill job."""
+
+    FIELDS = ("id", "machine_name", "start_time", "end_time", "interval_seconds",
+              "status", "resume_from", "pending", "rows_done", "rows_total", "error",
+              "created_at", "finished_at")
+
+    def __init__(self, **fields):
+        self.id = fields.get("id")
+        self.machine_name = fields.get("machine_name")
+        self.start_time = fields.get("start_time")
+        self.end_time = fields.get("end_time")
+        self.interval_seconds = fields.get("interval_seconds")
+        self.status = fields.get("status")
+        self.resume_from = fields.get("resume_from")
+        # {"resume_from", "rows"} of a chunk whose commit has not been confirmed.
+        self.pending = fields.get("pending")
+        self.rows_done = fields.get("rows_done") or 0
+        self.rows_total = fields.get("rows_total")
+        self.error = fields.get("error")
+        self.created_at = fields.get("created_at")
+        self.finished_at = fields.get("finished_at")
+        # Progress of the current run, for the rate; not persisted.
+        self.run_started = None
+        self.run_stopped = None
+        self.run_rows = 0
+        self.cancel_event = threading.Event()
+
+    def as_dict(self):
+        """Return the persisted fields of the job."""
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def progress(self):
+        """Return the job with its completion ratio, rows per second and ETA."""
+        result = self.as_dict()
+        elapsed = 0.0
+        if self.run_started:
+            elapsed = (self.run_stopped or time.monotonic()) - self.run_started
+        rate = self.run_rows / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, (self.rows_total or 0) - self.rows_done)
+        result["progress"] = round(self.rows_done / self.rows_total, 4) if self.rows_total else 0.0
+        result["rows_per_second"] = round(rate, 1)
+        result["eta_seconds"] = (
+            round(remaining / rate, 1) if self.status == RUNNING and rate > 0 else None
+        )
+        return result
+
+
+class BackfillJobManager:
+    """
+    Runs backfill jobs on ``max_workers`` daemon threads and keeps their state on disk.
+
+    :param runner: Callable taking a job and returning an iterator that writes the
+        job's rows from ``job.resume_from`` one chunk at a time without committing them,
+        yielding (next resume_from, rows written, callable committing the chunk).
+    :param chunk_committed: Callable taking a job and returning whether its pending
+        chunk is in the database.
+    :param directory: Directory the jobs are persisted in.
+    :param max_workers: Number of jobs running at the same time.
+    """
+
+    def __init__(self, runner, chunk_committed, directory, max_workers):
+        self.runner = runner
+        self.chunk_committed = chunk_committed
+        self.directory = directory
+        self.max_workers = max_workers
+        self._queue = queue.Queue()
+        self._workers = []
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+        os.makedirs(directory, exist_ok=True)
+
+    def recover(self, resume=False):
+        """
+        Load persisted jobs, marking jobs that were queued or running as interrupted.
+
+        :param resume: Resume interrupted jobs right away.
+        """
+        interrupted = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as file:
+                    job = BackfillJob(**json.load(file))
+            except (OSError, ValueError, TypeError) as exc:
+                logging.error("Could not load backfill job %s: %s", name, exc)
+                continue
+            if job.status in (QUEUED, RUNNING):
+                job.status = INTERRUPTED
+                self._save(job)
+            if job.status == INTERRUPTED:
+                interrupted.append(job.id)
+            with self._lock:
+                self._jobs[job.id] = job
+        logging.info("Recovered %d backfill jobs, %d interrupted.", len(self._jobs), len(interrupted))
+        if resume:
+            for job_id in interrupted:
+                self.resume(job_id)
+
+    def submit(self, machine_name, start_time, end_time, interval_seconds, rows_total):
+        """Queue a new job and return it."""
+        job = BackfillJob(
+            id=uuid.uuid4().hex[:12],
+            machine_name=machine_name,
+            start_time=start_time.isoformat(),
+            end_time=end_time.isoformat(),
+            interval_seconds=interval_seconds,
+            status=QUEUED,
+            resume_from=start_time.isoformat(),
+            rows_total=rows_total,
+            created_at=datetime.datetime.utcnow().isoformat(),
+        )
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id):
+        """Return a job by id, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Return every job, oldest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at or "")
+
+    def cancel(self, job_id):
+        """
+        Ask a job to stop after its current chunk.
+
+        :raises KeyError: If there is no such job.
+        :raises JobStateError: If the job has already finished.
+        """
+        job = self._require(job_id)
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                raise JobStateError(f"Job {job_id} has already {job.status}.")
+            job.cancel_event.set()
+            if job.status == INTERRUPTED:
+                job.status = CANCELLED
+        self._save(job)
+        return job
+
+    def resume(self, job_id):
+        """
+        Queue an interrupted or failed job again from its last committed chunk.
+
+        :raises KeyError: If there is no such job.
+        :raises JobStateError: If the job is not interrupted or failed.
+        """
+        job = self._require(job_id)
+        with self._lock:
+            if job.status not in (INTERRUPTED, FAILED):
+                raise JobStateError(f"Job {job_id} is {job.status} and cannot be resumed.")
+            job.status = QUEUED
+            job.error = None
+            job.finished_at = None
+            job.cancel_event.clear()
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    def shutdown(self):
+        """Stop queued and running jobs after their current chunk, leaving them interrupted."""
+        self._stopping = True
+        for job in self.jobs():
+            job.cancel_event.set()
+        with self._lock:
+            workers = list(self._workers)
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    def _enqueue(self, job):
+        """Queue a job, starting the worker threads on first use."""
+        with self._lock:
+            if not self._workers:
+                for index in range(self.max_workers):
+                    worker = threading.Thread(
+                        target=self._work, name=f"backfill-job-{index}", daemon=True
+                    )
+                    worker.start()
+                    self._workers.append(worker)
+        self._queue.put(job)
+
+    def _work(self):
+        """Run queued jobs until shutdown() queues the stop marker."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _require(self, job_id):
+        """Return a job by id or raise KeyError."""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def _run(self, job):
+        """Run a job chunk by chunk until it completes, fails or is cancelled."""
+        if job.cancel_event.is_set():
+            self._finish(job, self._stopped_status())
+            return
+        job.status = RUNNING
+        job.run_started = time.monotonic()
+        job.run_stopped = None
+        job.run_rows = 0
+        self._save(job)
+        try:
+            if job.pending is not None:
+                self._settle_pending(job)
+            for resume_from, rows, commit in self.runner(job):
+                job.pending = {"resume_from": resume_from, "rows": rows}
+                self._save(job)
+                commit()
+                self._acknowledge(job)
+                job.run_rows += rows
+                if job.cancel_event.is_set():
+                    self._finish(job, self._stopped_status())
+                    return
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logging.error("Backfill job %s failed: %s", job.id, exc)
+            job.error = str(exc)
+            self._finish(job, FAILED)
+            return
+        self._finish(job, COMPLETED)
+
+    def _settle_pending(self, job):
+        """Resolve a chunk left pending by an interrupted run."""
+        if self.chunk_committed(job):
+            logging.info("Backfill job %s: pending chunk was committed.", job.id)
+            self._acknowledge(job)
+        else:
+            job.pending = None
+            self._save(job)
+
+    def _acknowledge(self, job):
+        """Advance a job past its pending chunk once the chunk is committed."""
+        job.resume_from = job.pending["resume_from"]
+        job.rows_done += job.pending["rows"]
+        job.pending = None
+        self._save(job)
+
+    def _stopped_status(self):
+        """Return the status of a job stopped by cancel() or by shutdown()."""
+        return INTERRUPTED if self._stopping else CANCELLED
+
+    def _finish(self, job, status):
+        """Record the final state of a run."""
+        job.status = status
+        job.run_stopped = time.monotonic()
+        if status in FINISHED_STATES:
+            job.finished_at = datetime.datetime.utcnow().isoformat()
+        self._save(job)
+        logging.info("Backfill job %s %s with %d rows.", job.id, status, job.rows_done)
+
+    def _save(self, job):
+        """Atomically persist a job."""
+        path = os.path.join(self.directory, f"{job.id}.json")
+        temporary_path = f"{path}.tmp"
+        try:
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump(job.as_dict(), file)
+            os.replace(temporary_path, path)
+        except OSError as exc:
+            logging.error("Could not persist backfill job %s: %s", job.id, exc)
@@ -8,6 +8,28 @@ MQTT_BROKER = "192.168.194.177"
 # MQTT_BROKER = 'mqtt.eclipseprojects.io'
 MQTT_PORT = 1883
 
+# Publishing and ingest connections; a broker or port of None falls back to MQTT_BROKER/MQTT_PORT.
+# PUBLISH_MODE: 'per_machine' opens one client per machine, 'shared' publishes over one client.
+PUBLISH_MODE = 'per_machine'
+PUBLISH_BROKER = None
+PUBLISH_PORT = None
+# PUBLISH_ENGINE: 'thread' publishes from one thread over paho clients with their own
+# network threads, 'asyncio' drives ASYNC_PUBLISH_CONNECTIONS clients from a single event
+# loop, with at most ASYNC_MAX_INFLIGHT unsent or unacknowledged messages per connection.
+# 'none' publishes nothing, for when simulator_shards.py publishes the fleet instead.
+PUBLISH_ENGINE = 'thread'
+ASYNC_PUBLISH_CONNECTIONS = 4
+ASYNC_MAX_INFLIGHT = 1000
+# PUBLISH_FORMAT: 'legacy' publishes each parameter as a bare value on its own topic (used by
+# the Node-RED flows), 'json' or 'binary' publish one frame per machine on its frame topic.
+PUBLISH_FORMAT = 'legacy'
+# INGEST_MODE: 'per_machine' subscribes every topic on the machine clients, 'multiplexed'
+# subscribes wildcard filters over INGEST_CONNECTIONS clients and dispatches by topic.
+INGEST_MODE = 'multiplexed'
+INGEST_BROKER = None
+INGEST_PORT = None
+INGEST_CONNECTIONS = 1
+
 def set_broker_config(broker, port):
     """Set the MQTT broker configuration."""
     global MQTT_BROKER, MQTT_PORT  # pylint: disable=global-statement
@@ -15,6 +37,16 @@ def set_broker_config(broker, port):
     MQTT_PORT = port
 
 
+def get_publish_broker():
+    """Return the (broker, port) used for publishing machine data."""
+    return PUBLISH_BROKER or MQTT_BROKER, PUBLISH_PORT or MQTT_PORT
+
+
+def get_ingest_broker():
+    """Return the (broker, port) used for ingesting machine data."""
+    return INGEST_BROKER or MQTT_BROKER, INGEST_PORT or MQTT_PORT
+
+
 def save_broker_config():
     """Save the current broker configuration to the file."""
     current_file = inspect.getfile(inspect.currentframe())
@@ -0,0 +1,6 @@
+"""
+pytest configuration for the backend tests.
+"""
+
+# app_test.py is a manual MQTT script that loops forever, not a test module.
+collect_ignore = ["app_test.py"]
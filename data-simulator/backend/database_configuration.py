@@ -2,72 +2,273 @@
 Database configuration file.
 """
 
+import collections
+import contextlib
 import logging
+import threading
 import time
 import psycopg2
+from psycopg2 import extensions
+
+DB_SETTINGS = {
+    "dbname": "admin",
+    "user": "postgres",
+    "password": "postgres",
+    "host": "localhost",
+}
+# Seconds a single connection attempt may take before it is abandoned.
+DB_CONNECT_TIMEOUT = 3
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+# Seconds a caller waits for a free pooled connection before giving up.
+DB_POOL_CHECKOUT_TIMEOUT = 5.0
+# Idle connections older than this many seconds are pinged before being handed out.
+DB_POOL_VALIDATION_INTERVAL = 30.0
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
 
 
 class DatabaseConnectionError(Exception):
     """Exception raised when the database connection cannot be established."""
 
 
+class PoolTimeoutError(DatabaseConnectionError):
+    """Exception raised when no pooled connection becomes available in time."""
+
+
+def connect():
+    """Open a single connection to the PostgreSQL database without retrying."""
+    try:
+        return psycopg2.connect(connect_timeout=DB_CONNECT_TIMEOUT, **DB_SETTINGS)
+    except psycopg2.OperationalError as exc:
+        raise DatabaseConnectionError(f"Failed to connect to the database: {exc}") from exc
+
+
 def get_db_connection():
-    """Establish a connection to the PostgreSQL database."""
+    """
+    Establish a connection to the PostgreSQL database, retrying on failure.
+
+    The retry loop sleeps between attempts, so it is meant for startup and scripts only.
+    Request handlers and the ingest path borrow connections through db_connection().
+    """
     retries = 5
     for attempt in range(retries):
         try:
-            conn = psycopg2.connect(
-                dbname="admin",
-                user="postgres",
-                password="postgres",
-                host="localhost",
-            )
-            return conn
-        except psycopg2.OperationalError as exc:
+            return connect()
+        except DatabaseConnectionError as exc:
             logging.error("Database connection failed (attempt %d): %s.", attempt + 1, exc)
+            last_error = exc
             time.sleep(5)
     logging.critical("Failed to connect to the database after %d retries.", retries)
-    raise DatabaseConnectionError("Failed to connect to the database.") from exc
+    raise DatabaseConnectionError("Failed to connect to the database.") from last_error
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable PostgreSQL connections."""
+
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE,
+                 checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                 validation_interval=DB_POOL_VALIDATION_INTERVAL):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.validation_interval = validation_interval
+        self._idle = collections.deque()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def fill(self):
+        """Open connections until the pool holds at least min_size of them."""
+        while True:
+            with self._condition:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = connect()
+            except DatabaseConnectionError:
+                self._release_slot()
+                raise
+            self.putconn(conn)
+
+    def getconn(self, timeout=None):
+        """
+        Borrow a live connection from the pool.
+
+        :param timeout: Seconds to wait for a free connection, defaults to checkout_timeout.
+        :raises PoolTimeoutError: If every connection stays busy for the whole timeout.
+        :raises DatabaseConnectionError: If a new connection cannot be opened.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, returned_at = self._checkout(deadline)
+            if conn is None:
+                try:
+                    return connect()
+                except DatabaseConnectionError:
+                    self._release_slot()
+                    raise
+            if self._is_alive(conn, returned_at):
+                return conn
+            self._discard(conn)
+
+    def putconn(self, conn):
+        """Return a borrowed connection, discarding it if it is no longer usable."""
+        if not conn.closed and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        if conn.closed or conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            self._discard(conn)
+            return
+        with self._condition:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Context manager borrowing a connection and returning it to the pool on exit."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        """Close idle connections and refuse to pool connections returned afterwards."""
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                conn.close()
+            self._condition.notify_all()
+
+    def stats(self):
+        """Return the number of open and idle connections."""
+        with self._condition:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+    def _checkout(self, deadline):
+        """Take an idle connection, or reserve a slot for a new one (returned as None)."""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise DatabaseConnectionError("Connection pool is closed.")
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"No database connection available within {self.checkout_timeout}s."
+                    )
+                self._condition.wait(remaining)
+
+    def _is_alive(self, conn, returned_at):
+        """Check that a pooled connection is still usable."""
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.validation_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as exc:
+            logging.warning("Discarding dead pooled database connection: %s", exc)
+            return False
+
+    def _discard(self, conn):
+        """Close a connection and free its slot in the pool."""
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._release_slot()
+
+    def _release_slot(self):
+        """Free one slot in the pool and wake up a waiting borrower."""
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _POOL  # pylint: disable=global-statement
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool()
+    return _POOL
+
+
+def db_connection(timeout=None):
+    """Borrow a connection from the process-wide pool as a context manager."""
+    return get_pool().connection(timeout)
+
+
+def wait_for_database(retries=5, delay=5):
+    """Block until the pool can open its minimum number of connections."""
+    for attempt in range(retries):
+        try:
+            get_pool().fill()
+            return
+        except DatabaseConnectionError as exc:
+            logging.error("Database connection failed (attempt %d): %s.", attempt + 1, exc)
+            time.sleep(delay)
+    logging.critical("Failed to connect to the database after %d retries.", retries)
+    raise DatabaseConnectionError("Failed to connect to the database.")
 
 
 def create_table_if_not_exists():
     """Create the machine_data table if it doesn't already exist."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS machine_data (
-                    id SERIAL PRIMARY KEY,
-                    machine_name VARCHAR(255),
-                    topic VARCHAR(255),
-                    value FLOAT,
-                    unit VARCHAR(50),
-                    timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS machine_data (
+                        id SERIAL PRIMARY KEY,
+                        machine_name VARCHAR(255),
+                        topic VARCHAR(255),
+                        value FLOAT,
+                        unit VARCHAR(50),
+                        timestamp TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
                 )
-                """
-            )
-            conn.commit()
-    except psycopg2.Error as exc:
-        logging.error("Error creating table: %s", exc)
-    finally:
-        conn.close()
+                conn.commit()
+        except psycopg2.Error as exc:
+            logging.error("Error creating table: %s", exc)
 
 
 def insert_machine_data(machine, topic, message, unit):
     """Insert data into the machine_data table."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
-                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-                """,
-                (machine, topic, message, unit),
-            )
-            conn.commit()
-    except psycopg2.Error as exc:
-        logging.error("Database error: %s", exc)
-    finally:
-        conn.close()
+    with db_connection() as conn:
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
+                    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    """,
+                    (machine, topic, message, unit),
+                )
+                conn.commit()
+        except psycopg2.Error as exc:
+            logging.error("Database error: %s", exc)
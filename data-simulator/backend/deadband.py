@@ -0,0 +1,61 @@
+"""
+Report-by-exception filtering of machine parameter values.
+"""
+
+import threading
+import time
+
+
+class DeadbandFilter:
+    """
+    Decides whether a value is worth reporting compared to the last reported one.
+
+    A value is reported when it leaves the band around the last reported value of its
+    topic, or when the topic has been silent for longer than its heartbeat.
+    """
+
+    def __init__(self, deadbands, default_deadband, clock=time.monotonic):
+        self.deadbands = deadbands
+        self.default_deadband = default_deadband
+        self.clock = clock
+        self._last_reported = {}
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._suppressed = 0
+
+    def should_report(self, topic, parameter, value, now=None):
+        """Return True if the value must be reported, remembering it if so."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._seen += 1
+            last = self._last_reported.get(topic)
+            if last is not None and not self._outside_band(parameter, value, last, now):
+                self._suppressed += 1
+                return False
+            self._last_reported[topic] = (value, now)
+            return True
+
+    def stats(self):
+        """Return the number of seen and suppressed values and the suppression ratio."""
+        with self._lock:
+            seen, suppressed = self._seen, self._suppressed
+        return {
+            "seen": seen,
+            "reported": seen - suppressed,
+            "suppressed": suppressed,
+            "suppression_ratio": round(suppressed / seen, 4) if seen else 0.0,
+        }
+
+    def _outside_band(self, parameter, value, last, now):
+        """Return True if a value leaves the band or the heartbeat has expired."""
+        last_value, last_time = last
+        deadband = self.deadbands.get(parameter, self.default_deadband)
+        if now - last_time >= deadband.get('max_silence_s', float("inf")):
+            return True
+        if not isinstance(value, (int, float)) or not isinstance(last_value, (int, float)):
+            return value != last_value
+        band = max(
+            deadband.get('absolute', 0.0),
+            abs(last_value) * deadband.get('percent', 0.0) / 100.0,
+        )
+        return abs(value - last_value) > band
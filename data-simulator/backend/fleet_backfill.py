@@ -0,0 +1,186 @@
+"""
+Parallel backfill of past data for many machines on a process pool.
+
+Run ``python fleet_backfill.py --start 2024-01-01 --end 2024-02-01 --workers 8`` to
+backfill every configured machine. Each machine's range is cut into shards of
+BACKFILL_SHARD_SECONDS. A shard is generated by one worker process from its own
+numpy.random.Generator, seeded by SeedSequence(seed, spawn_key=(machine key, shard)),
+and written through that worker's own bulk loader. Shard boundaries and seeds
+depend only on the request, never on the number of workers, so a given seed always
+produces the same rows.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import json
+import logging
+import multiprocessing
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from backfill import COPY_VALUE_FORMAT, iter_backfill_chunks, timestamp_count  # type: ignore
+from bulk_loader import BulkLoader  # type: ignore
+from database_configuration import db_connection  # type: ignore
+from machine_registry import get_registry  # type: ignore
+from simulator_configuration import (  # type: ignore
+    BACKFILL_SHARD_SECONDS, CONFIG_FILE, FLEET_BACKFILL_WORKERS,
+)
+
+# One unit of work: the timestamps start_time + k * interval_seconds for k < count
+# of one machine. columns lists (parameter, topic, unit) of the stored parameters.
+BackfillShard = collections.namedtuple("BackfillShard", [
+    "machine_name", "index", "ranges", "starting_values", "columns",
+    "start_time", "count", "interval_seconds", "seed",
+])
+
+
+def shard_rng(seed, machine_name, index):
+    """Return the random generator of one shard of a machine."""
+    machine_key = zlib.crc32(machine_name.encode("utf-8"))
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(machine_key, index)))
+
+
+def plan_shards(machines, start_time, end_time, interval_seconds, seed,
+                shard_seconds=BACKFILL_SHARD_SECONDS):
+    """
+    Split the backfill of every machine into fixed-length shards.
+
+    :param machines: Iterable of (machine_name, ranges, starting_values, columns).
+    """
+    total = timestamp_count(start_time, end_time, interval_seconds)
+    shard_steps = max(1, int(shard_seconds // interval_seconds))
+    shards = []
+    for machine_name, ranges, starting_values, columns in machines:
+        for index, offset in enumerate(range(0, total, shard_steps)):
+            shards.append(BackfillShard(
+                machine_name, index, ranges, starting_values, columns,
+                start_time + datetime.timedelta(seconds=offset * interval_seconds),
+                min(shard_steps, total - offset), interval_seconds, seed,
+            ))
+    return shards
+
+
+def iter_shard_chunks(shard):
+    """Generate the BackfillChunks of a shard."""
+    end_time = shard.start_time + datetime.timedelta(
+        seconds=(shard.count - 1) * shard.interval_seconds
+    )
+    return iter_backfill_chunks(
+        shard.ranges, shard.starting_values, shard.start_time, end_time,
+        shard.interval_seconds, rng=shard_rng(shard.seed, shard.machine_name, shard.index),
+    )
+
+
+def run_shard(shard):
+    """Generate a shard and store it through this worker's bulk loader in one transaction."""
+    parameters = list(shard.ranges)
+    columns = [(parameters.index(parameter), topic, unit) for parameter, topic, unit in shard.columns]
+    with db_connection() as conn:
+        loader = BulkLoader(conn, transaction_rows=0)
+        for chunk in iter_shard_chunks(shard):
+            loader.write_columns(
+                shard.machine_name, columns, chunk.timestamps, chunk.values, COPY_VALUE_FORMAT
+            )
+        loader.commit()
+        return loader.stats()["rows"]
+
+
+def fleet_machines(machine_names=None):
+    """Return (machine_name, ranges, starting_values, columns) of the machines to backfill."""
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf-8") as file:
+            config = json.load(file)
+    except (OSError, ValueError):
+        config = {}
+    machines = []
+    for name, entry in get_registry().machines.items():
+        if not entry.ranges or (machine_names and name not in machine_names):
+            continue
+        columns = [
+            (parameter.parameter, parameter.topic, parameter.unit)
+            for parameter in entry.parameters if parameter.parameter in entry.ranges
+        ]
+        starting_values = {
+            **entry.starting_values, **config.get(name, {}).get("starting_values", {})
+        }
+        machines.append((name, dict(entry.ranges), starting_values, columns))
+    return machines
+
+
+def backfill_fleet(start_time, end_time, interval_seconds, workers=FLEET_BACKFILL_WORKERS,
+                   seed=0, machine_names=None):
+    """
+    Backfill the fleet on ``workers`` processes and return the row count, the rate and
+    the shards and machines that failed.
+
+    Workers are spawned rather than forked so that each opens its own database pool.
+    """
+    shards = plan_shards(
+        fleet_machines(machine_names), start_time, end_time, interval_seconds, seed
+    )
+    started = time.monotonic()
+    rows = 0
+    failed = 0
+    failed_machines = set()
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(run_shard, shard): shard for shard in shards}
+        for future in concurrent.futures.as_completed(futures):
+            shard = futures[future]
+            try:
+                rows += future.result()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                failed += 1
+                failed_machines.add(shard.machine_name)
+                logging.error(
+                    "Shard %d of %s starting %s failed: %s",
+                    shard.index, shard.machine_name, shard.start_time, exc
+                )
+    seconds = time.monotonic() - started
+    return {
+        "shards": len(shards),
+        "failed_shards": failed,
+        "failed_machines": sorted(failed_machines),
+        "rows": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def main():
+    """Parse the command line and backfill the fleet."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--start", required=True, type=datetime.datetime.fromisoformat,
+                        help="first timestamp (ISO format)")
+    parser.add_argument("--end", required=True, type=datetime.datetime.fromisoformat,
+                        help="last timestamp (ISO format)")
+    parser.add_argument("--interval", type=float, default=60, help="seconds between values")
+    parser.add_argument("--workers", type=int, default=FLEET_BACKFILL_WORKERS,
+                        help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random streams")
+    parser.add_argument("--machines", nargs="*", help="machines to backfill (default: all)")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s",
+    )
+    summary = backfill_fleet(
+        args.start, args.end, args.interval, args.workers, args.seed, args.machines
+    )
+    logging.info("Fleet backfill finished: %s", summary)
+    if summary["failed_shards"]:
+        logging.error(
+            "%d shards failed for the machines %s.",
+            summary["failed_shards"], ", ".join(summary["failed_machines"])
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Vectorized value generation for the whole fleet.
+
+The engine applies the same model as calculate_smoothed_value to every machine
+parameter at once: a uniform +/-7 % step around the parameter's current value,
+clipped to its PARAMETER_RANGES bounds, pushed into a short history and smoothed
+with linearly increasing weights (oldest 1, newest 2), rounded to two decimals.
+All state lives in contiguous NumPy arrays with one column per machine parameter,
+and the weighted sums are maintained incrementally as in smoothing.SmoothingHistory.
+Every column has its own ring position, so a subset of machines can be stepped
+while the others wait for their next publish.
+"""
+
+import numpy as np
+
+from smoothing import RESYNC_INTERVAL, smoothing_window  # type: ignore
+
+STEP_FRACTION = 0.07
+
+
+class FleetEngine:
+    """
+    Holds every machine's current values, bounds and history and advances them together.
+
+    :param machines: Iterable of (machine_name, ranges, starting_values) where ranges maps
+        parameter names to (low, high) and starting_values maps parameter names to values.
+    :param rng: numpy.random.Generator used for the steps.
+    :param window_for: Callable returning the smoothing window of a parameter name.
+    """
+
+    def __init__(self, machines, rng=None, window_for=smoothing_window):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.columns = []
+        self.slices = {}
+        lows, highs, currents, windows = [], [], [], []
+        for machine_name, ranges, starting_values in machines:
+            start = len(self.columns)
+            for parameter, (low, high) in ranges.items():
+                self.columns.append((machine_name, parameter))
+                lows.append(low)
+                highs.append(high)
+                currents.append(starting_values.get(parameter, (low + high) / 2))
+                windows.append(window_for(parameter))
+            self.slices[machine_name] = slice(start, len(self.columns))
+        self.low = np.asarray(lows, dtype=np.float64)
+        self.high = np.asarray(highs, dtype=np.float64)
+        self.current = np.clip(np.asarray(currents, dtype=np.float64), self.low, self.high)
+        self.windows = np.asarray(windows, dtype=np.int64)
+        self.capacity = int(self.windows.max()) if windows else 1
+        self.history = np.tile(self.current, (self.capacity, 1))
+        self._step_weight = np.where(
+            self.windows > 1, 1.0 / np.maximum(self.windows - 1, 1), 0.0
+        )
+        self._total_weight = np.where(self.windows > 1, 1.5 * self.windows, 1.0)
+        self._column_index = np.arange(len(self.columns))
+        self._position = np.zeros(len(self.columns), dtype=np.int64)
+        self._steps = 0
+        self._resync()
+
+    def __len__(self):
+        return len(self.columns)
+
+    def step(self, columns=None):
+        """
+        Advance parameters by one tick and return their smoothed values.
+
+        :param columns: Index array of the columns to advance, all columns when None.
+        """
+        if columns is None:
+            columns = self._column_index
+        current = self.current[columns]
+        change = self.rng.uniform(-STEP_FRACTION, STEP_FRACTION, len(columns)) * current
+        new_values = np.clip(current + change, self.low[columns], self.high[columns])
+        # Sample leaving each column's window: `window` slots behind the write position.
+        position = self._position[columns]
+        windows = self.windows[columns]
+        oldest = self.history[(position - windows) % self.capacity, columns]
+        self.history[position, columns] = new_values
+        self._position[columns] = (position + 1) % self.capacity
+
+        remaining = self._sum[columns] - oldest
+        weighted_sum = (self._weighted_sum[columns] + 2.0 * new_values - oldest
+                        - self._step_weight[columns] * remaining)
+        weighted_sum = np.where(windows == 1, new_values, weighted_sum)
+        self._weighted_sum[columns] = weighted_sum
+        self._sum[columns] = remaining + new_values
+        self._steps += 1
+        if self._steps >= RESYNC_INTERVAL:
+            self._resync()
+        return np.round(weighted_sum / self._total_weight[columns], 2)
+
+    def machine_columns(self, machine_names):
+        """Return the index array of the columns of the given machines."""
+        slices = [self.slices[name] for name in machine_names if name in self.slices]
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(s.start, s.stop) for s in slices])
+
+    def step_machines(self, machine_names):
+        """Advance only the given machines and return {machine: {parameter: value}}."""
+        columns = self.machine_columns(machine_names)
+        flat = self.step(columns).tolist()
+        result = {}
+        for index, value in zip(columns.tolist(), flat):
+            machine_name, parameter = self.columns[index]
+            result.setdefault(machine_name, {})[parameter] = value
+        return result
+
+    def carry_over(self, previous):
+        """Keep the current values and history of parameters that also exist in ``previous``."""
+        previous_index = {column: index for index, column in enumerate(previous.columns)}
+        previous_history = previous.ordered_history()
+        history = self.ordered_history()
+        depth = min(self.capacity, previous.capacity)
+        for index, column in enumerate(self.columns):
+            old_index = previous_index.get(column)
+            if old_index is None:
+                continue
+            self.current[index] = previous.current[old_index]
+            history[-depth:, index] = previous_history[-depth:, old_index]
+        self.history = history
+        self._position[:] = 0
+        self._resync()
+
+    def export_state(self):
+        """Return {machine: {parameter: {"current", "history"}}} with history oldest first."""
+        history = self.ordered_history()
+        result = {}
+        for index, (machine_name, parameter) in enumerate(self.columns):
+            samples = history[self.capacity - self.windows[index]:, index]
+            result.setdefault(machine_name, {})[parameter] = {
+                "current": float(self.current[index]),
+                "history": samples.tolist(),
+            }
+        return result
+
+    def restore_state(self, machines):
+        """Load current values and histories exported by export_state for known parameters."""
+        history = self.ordered_history()
+        for index, (machine_name, parameter) in enumerate(self.columns):
+            saved = machines.get(machine_name, {}).get(parameter)
+            if not saved or not saved.get("history"):
+                continue
+            self.current[index] = np.clip(saved["current"], self.low[index], self.high[index])
+            samples = np.asarray(saved["history"], dtype=np.float64)[-self.capacity:]
+            history[:, index] = samples[0]
+            history[self.capacity - len(samples):, index] = samples
+        self.history = history
+        self._position[:] = 0
+        self._resync()
+
+    def ordered_history(self):
+        """Return a copy of the history with rows ordered from oldest to newest in every column."""
+        rows = (self._position[None, :] + np.arange(self.capacity)[:, None]) % self.capacity
+        return self.history[rows, self._column_index]
+
+    def _resync(self):
+        """Recompute the plain and weighted sums exactly from the history."""
+        # Age 0 is the newest sample; ages at or beyond a column's window carry no weight.
+        ages = (self._position[None, :] - 1 - np.arange(self.capacity)[:, None]) % self.capacity
+        in_window = ages < self.windows
+        weights = np.where(self.windows > 1, 2.0 - ages * self._step_weight, 1.0)
+        weights = np.where(in_window, weights, 0.0)
+        self._sum = np.where(in_window, self.history, 0.0).sum(axis=0)
+        self._weighted_sum = (weights * self.history).sum(axis=0)
+        self._steps = 0
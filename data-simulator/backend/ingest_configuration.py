@@ -0,0 +1,37 @@
+"""
+Ingest pipeline configuration file.
+"""
+
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Maximum number of rows written to the database in a single batch.
+INGEST_BATCH_SIZE = 500
+# Maximum time a row may wait in the writer before its batch is flushed.
+INGEST_FLUSH_INTERVAL_MS = 250
+# Capacity of the in-memory queue between the MQTT callback and the writer.
+INGEST_QUEUE_SIZE = 50000
+# Batches of at least this many rows are written with COPY instead of INSERT. Keep it at
+# or below INGEST_BATCH_SIZE, or full live ingest batches never reach COPY.
+BULK_COPY_THRESHOLD = 500
+# Rows rendered in memory per COPY and rows per committed transaction when bulk loading
+# backfills. 0 commits a whole backfill in a single transaction.
+BULK_BUFFER_ROWS = 10000
+BULK_TRANSACTION_ROWS = 100000
+# Whether the Flask app persists ingested rows. Set to False when ingest_worker.py
+# processes persist them, so the app only keeps last values for /machines.
+INGEST_PERSIST = True
+# Number of ingest_worker.py processes and the MQTTv5 shared subscription group they join.
+INGEST_WORKERS = 4
+INGEST_SHARE_GROUP = "simulator-ingest"
+
+# Local journal receiving rows while the database is unavailable or the queue is full.
+SPILL_ENABLED = True
+SPILL_DIRECTORY = os.path.join(SCRIPT_DIR, "spill")
+SPILL_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+# 'always' fsyncs every append, 'interval' at most every SPILL_FSYNC_INTERVAL_S, 'never' leaves it to the OS.
+SPILL_FSYNC_POLICY = "interval"
+SPILL_FSYNC_INTERVAL_S = 1.0
+# How often the replayer checks the database and drains sealed segments.
+SPILL_REPLAY_INTERVAL_S = 5.0
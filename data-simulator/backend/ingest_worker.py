@@ -0,0 +1,124 @@
+"""
+Standalone ingest workers persisting machine data from MQTT shared subscriptions.
+
+Run ``python ingest_worker.py --workers 4`` next to the Flask app (with INGEST_PERSIST
+set to False there). Every worker process joins the same MQTTv5 shared subscription
+group, so the broker spreads the topic space across them and each one writes its share
+of messages through its own batching writer. Workers need no coordination beyond the broker.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+
+from broker_configuration import INGEST_CONNECTIONS, get_ingest_broker  # type: ignore
+from ingest_configuration import (  # type: ignore
+    INGEST_SHARE_GROUP,
+    INGEST_WORKERS,
+    SPILL_DIRECTORY,
+    SPILL_ENABLED,
+    SPILL_FSYNC_INTERVAL_S,
+    SPILL_FSYNC_POLICY,
+    SPILL_SEGMENT_MAX_BYTES,
+)
+from ingest_writer import BatchWriter  # type: ignore
+from machine_registry import get_registry  # type: ignore
+from mqtt_ingest import MqttIngest, decode_message, derive_topic_filters  # type: ignore
+from simulator_configuration import DEADBAND_INGEST_ENABLED  # type: ignore
+from sequencing import SequenceTracker  # type: ignore
+from spill_journal import SpillJournal  # type: ignore
+
+
+def create_worker_journal(worker_index):
+    """Create a spill journal in a directory owned by a single worker."""
+    if not SPILL_ENABLED:
+        return None
+    return SpillJournal(
+        os.path.join(SPILL_DIRECTORY, f"worker-{worker_index}"),
+        SPILL_SEGMENT_MAX_BYTES, SPILL_FSYNC_POLICY, SPILL_FSYNC_INTERVAL_S,
+    )
+
+
+def run_worker(worker_index, share_group, connections):
+    """Ingest the worker's share of messages until SIGTERM or SIGINT."""
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    writer = BatchWriter(journal=create_worker_journal(worker_index))
+    writer.start()
+    # A shared subscription member only sees part of each topic, so gaps are not meaningful.
+    tracker = SequenceTracker(track_sequences=False)
+
+    def handle_message(_client, _userdata, msg):
+        registry = get_registry()
+        for row in decode_message(msg, registry, tracker):
+            writer.submit(*row)
+
+    broker, port = get_ingest_broker()
+    registry = get_registry()
+    topics = list(registry.by_topic) + list(registry.by_frame_topic)
+    ingest = MqttIngest(
+        handle_message, broker, port, connections,
+        client_id_prefix=f"ingest-worker-{worker_index}-{os.getpid()}",
+        share_group=share_group,
+    )
+    ingest.start(derive_topic_filters(topics))
+    logging.info("Ingest worker %d joined shared group '%s'.", worker_index, share_group)
+
+    stop_event.wait()
+    ingest.stop()
+    writer.stop()
+    logging.info(
+        "Ingest worker %d stopped: %s, lag %s",
+        worker_index, writer.stats(), tracker.stats()["lag"]
+    )
+
+
+def main():
+    """Start the ingest worker processes and wait for them to finish."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS,
+                        help="number of worker processes")
+    parser.add_argument("--group", default=INGEST_SHARE_GROUP,
+                        help="MQTT shared subscription group")
+    parser.add_argument("--connections", type=int, default=INGEST_CONNECTIONS,
+                        help="MQTT connections per worker")
+    args = parser.parse_args()
+    if DEADBAND_INGEST_ENABLED:
+        # The broker spreads each topic's messages over the workers, so none of them
+        # sees every value a deadband would have to compare against.
+        parser.error(
+            "DEADBAND_INGEST_ENABLED is not supported with shared-subscription ingest "
+            "workers; disable it in simulator_configuration.py or ingest in the Flask app."
+        )
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s",
+    )
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker, args=(index, args.group, args.connections),
+            name=f"ingest-worker-{index}",
+        )
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
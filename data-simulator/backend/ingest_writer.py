@@ -0,0 +1,303 @@
+"""
+Write-behind stage persisting ingested machine data in batches.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+import psycopg2  # type: ignore
+from psycopg2.extras import execute_values  # type: ignore
+
+from bulk_loader import copy_rows  # type: ignore
+from database_configuration import DatabaseConnectionError, db_connection  # type: ignore
+from ingest_configuration import (  # type: ignore
+    BULK_COPY_THRESHOLD,
+    INGEST_BATCH_SIZE,
+    INGEST_FLUSH_INTERVAL_MS,
+    INGEST_QUEUE_SIZE,
+    SPILL_DIRECTORY,
+    SPILL_ENABLED,
+    SPILL_FSYNC_INTERVAL_S,
+    SPILL_FSYNC_POLICY,
+    SPILL_REPLAY_INTERVAL_S,
+    SPILL_SEGMENT_MAX_BYTES,
+)
+from spill_journal import SpillJournal, SpillReplayer  # type: ignore
+
+INSERT_ROWS_QUERY = """
+    INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
+    VALUES %s
+"""
+INSERT_ROW_QUERY = """
+    INSERT INTO machine_data (machine_name, topic, value, unit, timestamp)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+# Errors meaning the database cannot be reached, as opposed to rejecting the rows.
+UNAVAILABLE_ERRORS = (DatabaseConnectionError, psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_STOP = object()
+
+
+def write_rows(rows):
+    """
+    Write rows to machine_data in a single transaction, raising on failure.
+
+    Batches of BULK_COPY_THRESHOLD rows or more are streamed with COPY. If the database
+    rejects the data of a batch, its rows are inserted one by one instead so that only
+    the offending rows are lost.
+
+    :return: Number of rows rejected by the database.
+    """
+    with db_connection() as conn:
+        try:
+            if len(rows) >= BULK_COPY_THRESHOLD:
+                copy_rows(conn, rows)
+            else:
+                with conn.cursor() as cur:
+                    execute_values(cur, INSERT_ROWS_QUERY, rows, page_size=len(rows))
+            conn.commit()
+            return 0
+        except psycopg2.DataError as exc:
+            conn.rollback()
+            logging.warning("Batch of %d rows rejected (%s), inserting row by row.", len(rows), exc)
+            return insert_rows_individually(conn, rows)
+
+
+def insert_rows_individually(conn, rows):
+    """Insert rows one by one in a single transaction, skipping rows the database rejects."""
+    rejected = 0
+    with conn.cursor() as cur:
+        for row in rows:
+            cur.execute("SAVEPOINT machine_data_row")
+            try:
+                cur.execute(INSERT_ROW_QUERY, row)
+            except psycopg2.DataError as exc:
+                cur.execute("ROLLBACK TO SAVEPOINT machine_data_row")
+                rejected += 1
+                logging.warning("Dropping row for topic '%s': %s", row[1], exc)
+            else:
+                cur.execute("RELEASE SAVEPOINT machine_data_row")
+    conn.commit()
+    return rejected
+
+
+def probe_database():
+    """Raise one of UNAVAILABLE_ERRORS if the database cannot be reached."""
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+
+
+def create_spill_journal():
+    """Create the spill journal configured in ingest_configuration, or None if disabled."""
+    if not SPILL_ENABLED:
+        return None
+    return SpillJournal(
+        SPILL_DIRECTORY, SPILL_SEGMENT_MAX_BYTES, SPILL_FSYNC_POLICY, SPILL_FSYNC_INTERVAL_S
+    )
+
+
+class BatchWriter:
+    """
+    Collects machine data rows on a bounded queue and writes them from a dedicated thread.
+
+    A batch is flushed when either ``batch_size`` rows have accumulated or the oldest
+    row has waited ``flush_interval_ms`` milliseconds. With a spill journal, rows are
+    journaled instead of lost while the database is unreachable or the queue is full,
+    and a replayer drains the journal once the database recovers.
+    """
+
+    def __init__(self, batch_size=INGEST_BATCH_SIZE,
+                 flush_interval_ms=INGEST_FLUSH_INTERVAL_MS,
+                 queue_size=INGEST_QUEUE_SIZE, journal=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.journal = journal
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._db_healthy = threading.Event()
+        self._db_healthy.set()
+        self._replayer = None
+        if journal is not None:
+            self._replayer = SpillReplayer(
+                journal, write_rows, probe_database, self._db_healthy,
+                SPILL_REPLAY_INTERVAL_S, UNAVAILABLE_ERRORS,
+            )
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "batches": 0,
+            "rows_written": 0,
+            "rows_failed": 0,
+            "rows_dropped": 0,
+            "rows_rejected": 0,
+            "rows_spilled": 0,
+            "last_batch_size": 0,
+            "max_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def start(self):
+        """Start the writer thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+        self._thread.start()
+        if self._replayer is not None:
+            self._replayer.start()
+        logging.info(
+            "Ingest writer started (batch size %d, flush interval %.0f ms).",
+            self.batch_size, self.flush_interval * 1000
+        )
+
+    def submit(self, machine_name, topic, value, unit, timestamp):
+        """
+        Queue a row for writing without blocking the caller.
+
+        :return: False if the value is not numeric or the queue is full and the row
+            was dropped.
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            with self._stats_lock:
+                self._stats["rows_rejected"] += 1
+            logging.warning("Dropping non-numeric value %r for topic '%s'.", value, topic)
+            return False
+        row = (machine_name, topic, value, unit, timestamp)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            if self.journal is not None:
+                self._spill([row])
+                return True
+            with self._stats_lock:
+                self._stats["rows_dropped"] += 1
+            logging.warning("Ingest queue full. Dropping value for topic '%s'.", topic)
+            return False
+        return True
+
+    def stop(self, timeout=None):
+        """Flush every queued row and stop the writer thread."""
+        if not self._thread or not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._replayer is not None:
+            self._replayer.stop(timeout)
+            self.journal.close()
+        logging.info("Ingest writer stopped.")
+
+    def stats(self):
+        """Return batch size and flush latency statistics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats.pop("batches")
+        total_flush_ms = stats.pop("total_flush_ms")
+        stats["batches"] = batches
+        stats["avg_batch_size"] = round(stats["rows_written"] / batches, 2) if batches else 0.0
+        stats["avg_flush_ms"] = round(total_flush_ms / batches, 3) if batches else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        stats["database_healthy"] = self._db_healthy.is_set()
+        if self._replayer is not None:
+            stats["rows_replayed"] = self._replayer.rows_replayed
+            stats["spill_segments"] = len(self.journal.sealed_segments())
+        return stats
+
+    def _run(self):
+        """Collect rows into batches and flush them until stopped."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+        self._drain()
+
+    def _drain(self):
+        """Flush rows still queued after a stop request."""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        """Write a batch of rows with a single multi-row INSERT, spilling it if the database is down."""
+        if self.journal is not None and not self._db_healthy.is_set():
+            self._spill(batch)
+            return
+        started = time.perf_counter()
+        try:
+            rejected = write_rows(batch)
+        except UNAVAILABLE_ERRORS as exc:
+            logging.error("Could not write batch of %d rows: %s", len(batch), exc)
+            if self.journal is None:
+                self._record_failure(len(batch))
+                return
+            self._db_healthy.clear()
+            self._spill(batch)
+            return
+        except psycopg2.Error as exc:
+            logging.error("Database error while writing batch of %d rows: %s", len(batch), exc)
+            self._record_failure(len(batch))
+            return
+        if rejected:
+            with self._stats_lock:
+                self._stats["rows_rejected"] += rejected
+        self._record_flush(len(batch) - rejected, (time.perf_counter() - started) * 1000)
+
+    def _spill(self, rows):
+        """Append rows to the spill journal."""
+        try:
+            self.journal.append(rows)
+        except OSError as exc:
+            logging.critical("Could not spill %d rows to the journal: %s", len(rows), exc)
+            self._record_failure(len(rows))
+            return
+        with self._stats_lock:
+            self._stats["rows_spilled"] += len(rows)
+
+    def _record_flush(self, size, elapsed_ms):
+        """Update statistics after a successful flush."""
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["rows_written"] += size
+            self._stats["last_batch_size"] = size
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], size)
+            self._stats["last_flush_ms"] = round(elapsed_ms, 3)
+            self._stats["max_flush_ms"] = round(max(self._stats["max_flush_ms"], elapsed_ms), 3)
+            self._stats["total_flush_ms"] += elapsed_ms
+
+    def _record_failure(self, size):
+        """Update statistics after a failed flush."""
+        with self._stats_lock:
+            self._stats["rows_failed"] += size
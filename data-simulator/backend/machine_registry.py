@@ -0,0 +1,281 @@
+"""
+Immutable machine registry compiled from the machine configuration.
+"""
+
+import collections
+import logging
+import random
+import threading
+import time
+import types
+
+import machines_configuration  # type: ignore
+from simulator_configuration import MACHINE_TEMPLATES  # type: ignore
+
+ParameterEntry = collections.namedtuple(
+    "ParameterEntry", ["machine", "parameter", "topic", "unit"]
+)
+# starting_values holds per-instance starting values of virtual machines, which are
+# expanded from ``template``; both are empty for configured machines.
+MachineEntry = collections.namedtuple(
+    "MachineEntry",
+    ["name", "id", "parameters", "ranges", "frame_topic", "starting_values", "template"],
+)
+FRAME_TOPIC_SUFFIX = "frame"
+NO_STARTING_VALUES = types.MappingProxyType({})
+
+
+class MachineRegistry:
+    """
+    Read-only view of the configured machines with hash indexes for hot-path lookups.
+
+    Instances are never mutated; a configuration change compiles a new registry
+    which replaces the current one in a single reference assignment.
+    """
+
+    __slots__ = ("machines", "by_topic", "by_parameter", "by_frame_topic", "version")
+
+    def __init__(self, machines, by_topic, by_parameter, by_frame_topic, version):
+        self.machines = types.MappingProxyType(machines)
+        self.by_topic = types.MappingProxyType(by_topic)
+        self.by_parameter = types.MappingProxyType(by_parameter)
+        self.by_frame_topic = types.MappingProxyType(by_frame_topic)
+        self.version = version
+
+    def lookup_topic(self, topic):
+        """Return the ParameterEntry published on a topic, or None."""
+        return self.by_topic.get(topic)
+
+    def lookup_parameter(self, machine_name, parameter):
+        """Return the ParameterEntry of a machine parameter, or None."""
+        return self.by_parameter.get((machine_name, parameter))
+
+    def lookup_frame_topic(self, topic):
+        """Return the MachineEntry whose frames are published on a topic, or None."""
+        return self.by_frame_topic.get(topic)
+
+    def machine(self, machine_name):
+        """Return the MachineEntry of a machine, or None."""
+        return self.machines.get(machine_name)
+
+
+def derive_frame_topic(machine_name, parameters):
+    """
+    Derive the per-machine frame topic from the machine's parameter topics.
+
+    The frame topic is the deepest level shared by every parameter topic followed by
+    ``frame`` (``ZG/drilling/PLC/1/speed`` -> ``ZG/drilling/PLC/1/frame``), falling back
+    to ``ZG/<machine>/frame`` when the topics share no more than their root.
+    """
+    levels = None
+    for parameter in parameters:
+        if not parameter.topic:
+            continue
+        topic_levels = parameter.topic.split('/')[:-1]
+        if levels is None:
+            levels = topic_levels
+            continue
+        shared = 0
+        while shared < min(len(levels), len(topic_levels)) and levels[shared] == topic_levels[shared]:
+            shared += 1
+        levels = levels[:shared]
+    if not levels or len(levels) < 2:
+        return f"ZG/{machine_name}/{FRAME_TOPIC_SUFFIX}"
+    return '/'.join(levels + [FRAME_TOPIC_SUFFIX])
+
+
+def compile_machine(machine_name, info, parameter_ranges):
+    """Validate one machine configuration and compile it, returning None if it is malformed."""
+    if not isinstance(info, dict):
+        logging.error(
+            "Config for machine '%s' is not a dictionary: %s",
+            machine_name, type(info)
+        )
+        return None
+
+    parameters_list = info.get('parameters')
+    if not isinstance(parameters_list, list):
+        logging.error(
+            "'parameters' for machine '%s' is not a list: %s",
+            machine_name, type(parameters_list)
+        )
+        return None
+
+    parameters = []
+    for item in parameters_list:
+        if not isinstance(item, dict):
+            logging.error(
+                "Item in parameters for machine '%s' is not a dict: %s",
+                machine_name, type(item)
+            )
+            continue
+        parameters.append(
+            ParameterEntry(machine_name, item.get("parameter"), item.get("topic"), item.get("unit", ""))
+        )
+    ranges = types.MappingProxyType(dict(parameter_ranges.get(machine_name, {})))
+    frame_topic = derive_frame_topic(machine_name, parameters)
+    return MachineEntry(
+        machine_name, info.get('id'), tuple(parameters), ranges, frame_topic,
+        NO_STARTING_VALUES, None,
+    )
+
+
+def expand_template(template_name, template, base):
+    """
+    Yield the virtual machines of a template as MachineEntries.
+
+    Instances are named ``<template>-<n>`` and get the ids ``first_id`` onwards. Their
+    topics follow generate_topics_for_machine: ``ZG/<first three letters of the
+    template>/<id>/<PARAMETER>``. Every instance shares the base machine's ranges.
+    With ``jitter_percent``, each instance starts at its range midpoint moved by up to
+    that percentage, drawn from a generator seeded by ``seed``.
+    """
+    count = template.get('count', 0)
+    first_id = template.get('first_id', 1000)
+    jitter = template.get('jitter_percent', 0.0) / 100.0
+    rng = random.Random(template.get('seed', 0))
+    prefix = template_name[:3].upper()
+    for index in range(count):
+        name = f"{template_name}-{index + 1}"
+        machine_id = first_id + index
+        parameters = tuple(
+            ParameterEntry(
+                name, parameter.parameter,
+                f"ZG/{prefix}/{machine_id}/{(parameter.parameter or '').upper()}",
+                parameter.unit,
+            )
+            for parameter in base.parameters
+        )
+        starting_values = NO_STARTING_VALUES
+        if jitter:
+            starting_values = types.MappingProxyType({
+                parameter: min(max((low + high) / 2 * (1 + rng.uniform(-jitter, jitter)), low),
+                               high)
+                for parameter, (low, high) in base.ranges.items()
+            })
+        frame_topic = f"ZG/{prefix}/{machine_id}/{FRAME_TOPIC_SUFFIX}"
+        yield MachineEntry(
+            name, machine_id, parameters, base.ranges, frame_topic, starting_values, template_name
+        )
+
+
+def compile_entries(machine_types, parameter_ranges, templates):
+    """Yield the configured machines followed by the virtual machines of every template."""
+    configured = {}
+    for machine_name, info in machine_types.items():
+        entry = compile_machine(machine_name, info, parameter_ranges)
+        if entry is not None:
+            configured[machine_name] = entry
+            yield entry
+    for template_name, template in templates.items():
+        base = configured.get(template.get('machine_type'))
+        if base is None:
+            logging.error(
+                "Template '%s' refers to unknown machine type '%s'.",
+                template_name, template.get('machine_type')
+            )
+            continue
+        yield from expand_template(template_name, template, base)
+
+
+def compile_registry(machine_types, parameter_ranges, version=0, templates=None):
+    """Compile machine and parameter range configuration into a MachineRegistry."""
+    machines = {}
+    by_topic = {}
+    by_parameter = {}
+    by_frame_topic = {}
+    for entry in compile_entries(machine_types, parameter_ranges, templates or {}):
+        machine_name = entry.name
+        if machine_name in machines:
+            logging.warning("Machine '%s' is defined more than once.", machine_name)
+            continue
+        machines[machine_name] = entry
+        by_frame_topic[entry.frame_topic] = entry
+        for parameter in entry.parameters:
+            by_parameter[(machine_name, parameter.parameter)] = parameter
+            if not parameter.topic:
+                continue
+            if parameter.topic in by_topic:
+                logging.warning(
+                    "Topic '%s' of machine '%s' is already used by machine '%s'.",
+                    parameter.topic, machine_name, by_topic[parameter.topic].machine
+                )
+                continue
+            by_topic[parameter.topic] = parameter
+    return MachineRegistry(machines, by_topic, by_parameter, by_frame_topic, version)
+
+
+# Seconds between checks of whether the machine configuration was saved by another process.
+CONFIG_CHECK_INTERVAL_S = 1.0
+
+_REGISTRY = None
+_REBUILD_LOCK = threading.Lock()
+_CHECK_LOCK = threading.Lock()
+_LAST_CHECK = [time.monotonic()]
+REGISTRY_LISTENERS = []
+
+
+def add_registry_listener(callback):
+    """Register a callback invoked with the new registry after every rebuild."""
+    REGISTRY_LISTENERS.append(callback)
+
+
+def rebuild_registry(configuration=None):
+    """
+    Compile the current machine configuration and atomically swap it in.
+
+    :param configuration: Optional configuration re-read by
+        machines_configuration.read_if_changed(), applied under the same lock so that
+        no registry is compiled from a partly applied configuration.
+    """
+    global _REGISTRY  # pylint: disable=global-statement
+    with _REBUILD_LOCK:
+        if configuration is not None:
+            machines_configuration.apply_configuration(configuration)
+        version = _REGISTRY.version + 1 if _REGISTRY else 0
+        registry = compile_registry(
+            machines_configuration.MACHINE_TYPES,
+            machines_configuration.PARAMETER_RANGES,
+            version,
+            MACHINE_TEMPLATES,
+        )
+        _REGISTRY = registry
+    logging.info(
+        "Machine registry v%d compiled: %d machines, %d topics.",
+        registry.version, len(registry.machines), len(registry.by_topic)
+    )
+    for callback in REGISTRY_LISTENERS:
+        callback(registry)
+    return registry
+
+
+def get_registry():
+    """
+    Return the current machine registry, compiling it on first use.
+
+    At most every CONFIG_CHECK_INTERVAL_S the configuration file is checked for
+    changes saved by another process, which rebuilds the registry.
+    """
+    now = time.monotonic()
+    if now - _LAST_CHECK[0] >= CONFIG_CHECK_INTERVAL_S:
+        _check_configuration(now)
+    registry = _REGISTRY
+    if registry is None:
+        registry = rebuild_registry()
+    return registry
+
+
+def _check_configuration(now):
+    """Rebuild the registry if another process saved the configuration, one thread at a time."""
+    if not _CHECK_LOCK.acquire(blocking=False):
+        return
+    try:
+        _LAST_CHECK[0] = now
+        configuration = machines_configuration.read_if_changed()
+        if configuration is not None:
+            rebuild_registry(configuration)
+    finally:
+        _CHECK_LOCK.release()
+
+
+machines_configuration.add_config_listener(rebuild_registry)
@@ -3,6 +3,9 @@ File to store and process machine configuration.
 """
 
 import inspect
+import logging
+import os
+import runpy
 
 MACHINE_TYPES = {
     'DrillingMachine': {
@@ -83,6 +86,56 @@ PARAMETER_RANGES = {
 }
 
 current_id = max((info['id'] for info in MACHINE_TYPES.values()), default=0)
+CONFIG_LISTENERS = []
+CONFIG_FILE_STATE = {"mtime": os.stat(__file__).st_mtime_ns}
+
+
+def add_config_listener(callback):
+    """Register a callback invoked after the machine configuration changes."""
+    CONFIG_LISTENERS.append(callback)
+
+
+def notify_config_changed():
+    """Invoke every registered configuration listener."""
+    for callback in CONFIG_LISTENERS:
+        callback()
+
+
+def read_if_changed():
+    """
+    Re-read the configuration if this file has been saved since it was last read.
+
+    Lets a process such as the Flask app pick up changes saved by the UI or another
+    process. Nothing is changed here; the result is passed to apply_configuration().
+
+    :return: {name: value} of MACHINE_TYPES, GLOBAL_PARAMETERS and PARAMETER_RANGES as
+        saved, or None if the file is unchanged or cannot be read.
+    """
+    current_file = inspect.getfile(inspect.currentframe())
+    try:
+        mtime = os.stat(current_file).st_mtime_ns
+    except OSError:
+        return None
+    if mtime == CONFIG_FILE_STATE["mtime"]:
+        return None
+    CONFIG_FILE_STATE["mtime"] = mtime
+    try:
+        saved = runpy.run_path(current_file)
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        logging.error("Could not reload the machine configuration: %s", exc)
+        return None
+    logging.info("Machine configuration re-read from %s.", current_file)
+    return {name: saved[name] for name in ("MACHINE_TYPES", "GLOBAL_PARAMETERS", "PARAMETER_RANGES")}
+
+
+def apply_configuration(configuration):
+    """Swap in configuration read by read_if_changed(), replacing each dictionary whole."""
+    global MACHINE_TYPES, GLOBAL_PARAMETERS, PARAMETER_RANGES, current_id  # pylint: disable=global-statement
+    MACHINE_TYPES = configuration["MACHINE_TYPES"]
+    GLOBAL_PARAMETERS = configuration["GLOBAL_PARAMETERS"]
+    PARAMETER_RANGES = configuration["PARAMETER_RANGES"]
+    current_id = max((info['id'] for info in MACHINE_TYPES.values()), default=0)
+
 
 def generate_topics_for_machine(machine_name):
     """Generate topic strings for the machine parameters."""
@@ -120,6 +173,7 @@ def add_machine(machine_name, parameters):
     generate_topics_for_machine(machine_name)
     save_machines_config()
     save_parameter_ranges()
+    notify_config_changed()
 
 
 def delete_machine(machine_name):
@@ -131,6 +185,7 @@ def delete_machine(machine_name):
     if machine_name in PARAMETER_RANGES:
         del PARAMETER_RANGES[machine_name]
         save_parameter_ranges()
+    notify_config_changed()
 
 
 def add_parameter(parameter_name, range_values):
@@ -157,6 +212,7 @@ def add_parameter_to_machine(machine_name, parameter_name):
         generate_topics_for_machine(machine_name)
         save_machines_config()
         save_parameter_ranges()
+        notify_config_changed()
 
 
 def remove_parameter(parameter_name):
@@ -176,6 +232,7 @@ def remove_parameter(parameter_name):
         ]
     save_machines_config()
     save_parameter_ranges()
+    notify_config_changed()
 
 
 def create_machine_parameter_ranges():
@@ -0,0 +1,295 @@
+"""
+Capture of MQTT traffic into a compact binary log, and timed replay of such logs.
+
+Run ``python mqtt_capture.py record traffic.log --topic 'ZG/#'`` to append every
+message on a topic filter to a log until Ctrl+C or ``--duration`` seconds. Then
+``python mqtt_capture.py replay traffic.log --speed 10`` publishes the log again at ten
+times the recorded pace (``--speed 0`` for as fast as possible) and reports the
+achieved messages per second. Replay publishes over a single connection in log order,
+which keeps the relative timing and the order of messages on each topic.
+
+Log layout, little endian, after the magic ``ZGMQLOG1``:
+
+- topic record: kind 1, uint32 topic id, uint16 length and the UTF-8 topic, written the
+  first time a topic is seen
+- message record: kind 2, float64 arrival epoch, uint32 topic id, uint8 QoS and retain
+  flags, uint32 length and the payload
+
+Records are only ever appended, so recording can continue an existing log, and a log
+cut short by a crash is read up to its last complete record. Recording into such a
+log first cuts off the incomplete record. MQTTv5 properties are not captured.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import struct
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from broker_configuration import get_publish_broker  # type: ignore
+
+LOG_MAGIC = b"ZGMQLOG1"
+KIND = struct.Struct("<B")
+TOPIC_RECORD = struct.Struct("<IH")
+MESSAGE_RECORD = struct.Struct("<dIBI")
+TOPIC_KIND = 1
+MESSAGE_KIND = 2
+RETAIN_FLAG = 0x04
+REPLAY_WINDOW = 1000
+DRAIN_TIMEOUT_S = 30.0
+
+
+class CaptureLogError(ValueError):
+    """Exception raised for files that are not capture logs."""
+
+
+def _iter_records(file, path):
+    """
+    Yield (kind, fields) for every complete record of an open capture log.
+
+    Topic records give (topic_id, topic) and message records (epoch, topic_id, flags,
+    payload). Reading stops at an incomplete record; ``file.tell()`` taken after each
+    record is then the length of the complete part of the log.
+
+    :raises CaptureLogError: If the file is not a capture log.
+    """
+    if file.read(len(LOG_MAGIC)) != LOG_MAGIC:
+        raise CaptureLogError(f"{path} is not a capture log.")
+    while True:
+        kind = file.read(KIND.size)
+        if not kind:
+            return
+        (kind,) = KIND.unpack(kind)
+        if kind == TOPIC_KIND:
+            header = file.read(TOPIC_RECORD.size)
+            if len(header) < TOPIC_RECORD.size:
+                break
+            topic_id, length = TOPIC_RECORD.unpack(header)
+            topic = file.read(length)
+            if len(topic) < length:
+                break
+            yield kind, (topic_id, topic.decode("utf-8"))
+        elif kind == MESSAGE_KIND:
+            header = file.read(MESSAGE_RECORD.size)
+            if len(header) < MESSAGE_RECORD.size:
+                break
+            epoch, topic_id, flags, length = MESSAGE_RECORD.unpack(header)
+            payload = file.read(length)
+            if len(payload) < length:
+                break
+            yield kind, (epoch, topic_id, flags, payload)
+        else:
+            raise CaptureLogError(f"Unknown record kind {kind} in {path}.")
+    logging.warning("Capture log %s ends with an incomplete record.", path)
+
+
+def read_log(path):
+    """
+    Yield (epoch, topic, payload, qos, retain) for every message of a capture log.
+
+    :raises CaptureLogError: If the file is not a capture log.
+    """
+    topics = {}
+    with open(path, "rb") as file:
+        for kind, fields in _iter_records(file, path):
+            if kind == TOPIC_KIND:
+                topic_id, topic = fields
+                topics[topic_id] = topic
+            else:
+                epoch, topic_id, flags, payload = fields
+                yield epoch, topics[topic_id], payload, flags & 0x03, bool(flags & RETAIN_FLAG)
+
+
+class CaptureWriter:
+    """
+    Appends messages to a capture log, adding topics to its dictionary as they appear.
+
+    An existing log is continued with its topic dictionary, after cutting off an
+    incomplete record left by a crash. Appends are thread-safe.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.messages = 0
+        self._topics = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self._file = open(path, "r+b")  # pylint: disable=consider-using-with
+            length = len(LOG_MAGIC)
+            try:
+                for kind, fields in _iter_records(self._file, path):
+                    length = self._file.tell()
+                    if kind == TOPIC_KIND:
+                        topic_id, topic = fields
+                        self._topics[topic] = topic_id
+            except CaptureLogError:
+                self._file.close()
+                raise
+            if length < os.path.getsize(path):
+                logging.warning("Truncating %s to its last complete record at %d bytes.", path, length)
+                self._file.truncate(length)
+            self._file.seek(length)
+        else:
+            self._file = open(path, "wb")  # pylint: disable=consider-using-with
+            self._file.write(LOG_MAGIC)
+
+    def append(self, epoch, topic, payload, qos=0, retain=False):
+        """Append one message."""
+        flags = qos | (RETAIN_FLAG if retain else 0)
+        with self._lock:
+            topic_id = self._topics.get(topic)
+            if topic_id is None:
+                topic_id = self._topics[topic] = len(self._topics)
+                encoded = topic.encode("utf-8")
+                self._file.write(
+                    KIND.pack(TOPIC_KIND) + TOPIC_RECORD.pack(topic_id, len(encoded)) + encoded
+                )
+            self._file.write(
+                KIND.pack(MESSAGE_KIND)
+                + MESSAGE_RECORD.pack(epoch, topic_id, flags, len(payload)) + payload
+            )
+            self.messages += 1
+
+    def flush(self):
+        """Write buffered records to the file."""
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        """Flush and close the log."""
+        with self._lock:
+            self._file.close()
+
+
+def record(path, topic_filter, broker, port, duration=None, stop_event=None):
+    """
+    Record every message on ``topic_filter`` into a capture log.
+
+    Stops after ``duration`` seconds or once ``stop_event`` is set, and returns the
+    number of messages captured and the capture rate.
+    """
+    stop_event = stop_event or threading.Event()
+    writer = CaptureWriter(path)
+    client = mqtt.Client(client_id=f"capture-{os.getpid()}", protocol=mqtt.MQTTv5)
+    client.on_connect = lambda client, *_: client.subscribe(topic_filter)
+    client.on_message = lambda _client, _userdata, msg: writer.append(
+        time.time(), msg.topic, msg.payload, msg.qos, msg.retain
+    )
+    client.connect(broker, port)
+    client.loop_start()
+    logging.info("Recording '%s' from %s:%s into %s.", topic_filter, broker, port, path)
+    started = time.monotonic()
+    try:
+        while not stop_event.wait(min(1.0, duration) if duration is not None else 1.0):
+            writer.flush()
+            if duration is not None and time.monotonic() - started >= duration:
+                break
+    finally:
+        seconds = time.monotonic() - started
+        client.loop_stop()
+        client.disconnect()
+        writer.close()
+    return {
+        "messages": writer.messages,
+        "seconds": round(seconds, 3),
+        "messages_per_second": round(writer.messages / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def replay(path, broker, port, speed=1.0, window=REPLAY_WINDOW, stop_event=None):
+    """
+    Publish a capture log against a broker and return the achieved rate.
+
+    :param speed: Multiple of the recorded pace; 0 publishes as fast as possible.
+    :param window: Maximum number of messages handed to paho but not yet written or
+        acknowledged, which bounds memory at high speeds.
+    """
+    stop_event = stop_event or threading.Event()
+    inflight = [0]
+    room = threading.Condition()
+
+    def on_publish(*_):
+        with room:
+            inflight[0] -= 1
+            room.notify()
+
+    client = mqtt.Client(client_id=f"replay-{os.getpid()}", protocol=mqtt.MQTTv5)
+    client.on_publish = on_publish
+    client.connect(broker, port)
+    client.loop_start()
+    messages = 0
+    max_lateness = 0.0
+    first_epoch = None
+    started = time.monotonic()
+    try:
+        for epoch, topic, payload, qos, retain in read_log(path):
+            if stop_event.is_set():
+                break
+            if first_epoch is None:
+                first_epoch = epoch
+            if speed > 0:
+                delay = started + (epoch - first_epoch) / speed - time.monotonic()
+                if delay > 0:
+                    if stop_event.wait(delay):
+                        break
+                else:
+                    max_lateness = max(max_lateness, -delay)
+            with room:
+                while inflight[0] >= window:
+                    room.wait()
+                inflight[0] += 1
+            info = client.publish(topic, payload, qos, retain)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                on_publish()
+                logging.warning("Replaying to '%s' failed: %s", topic, mqtt.error_string(info.rc))
+                continue
+            messages += 1
+        with room:
+            room.wait_for(lambda: inflight[0] <= 0, timeout=DRAIN_TIMEOUT_S)
+    finally:
+        seconds = time.monotonic() - started
+        client.loop_stop()
+        client.disconnect()
+    return {
+        "messages": messages,
+        "seconds": round(seconds, 3),
+        "messages_per_second": round(messages / seconds, 1) if seconds > 0 else 0.0,
+        "max_lateness_ms": round(max_lateness * 1000.0, 3),
+    }
+
+
+def main():
+    """Parse the command line and record or replay a capture log."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    default_broker, default_port = get_publish_broker()
+    parser.add_argument("--broker", default=default_broker, help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=default_port, help="MQTT broker port")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="capture messages into a log")
+    record_parser.add_argument("log_path")
+    record_parser.add_argument("--topic", default="#", help="topic filter to capture")
+    record_parser.add_argument("--duration", type=float, help="seconds to capture (default: until Ctrl+C)")
+    replay_parser = commands.add_parser("replay", help="publish a log against the broker")
+    replay_parser.add_argument("log_path")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="multiple of the recorded pace, 0 for maximum speed")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    if args.command == "record":
+        summary = record(args.log_path, args.topic, args.broker, args.port, args.duration, stop_event)
+        logging.info("Capture finished: %s", summary)
+    else:
+        summary = replay(args.log_path, args.broker, args.port, args.speed, stop_event=stop_event)
+        logging.info("Replay finished: %s", summary)
+
+
+if __name__ == "__main__":
+    main()
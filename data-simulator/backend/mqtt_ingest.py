@@ -0,0 +1,152 @@
+"""
+Multiplexed MQTT ingest over a small fixed number of broker connections.
+"""
+
+import logging
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from payload_frames import FrameDecodeError, decode_frame, from_epoch, to_epoch  # type: ignore
+from sequencing import read_message_properties  # type: ignore
+
+
+def derive_topic_filters(topics):
+    """
+    Derive wildcard subscription filters covering every topic.
+
+    Each topic is covered by a filter on its first level (``ZG/drilling/...`` -> ``ZG/#``);
+    single-level topics are subscribed as they are.
+    """
+    filters = set()
+    for topic in topics:
+        if not topic:
+            continue
+        root, separator, _ = topic.partition('/')
+        filters.add(f"{root}/#" if separator else topic)
+    return sorted(filters)
+
+
+def decode_value(payload):
+    """Decode a legacy payload into a float, keeping non-numeric payloads as text."""
+    text = payload.decode()
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def decode_message(msg, registry, tracker=None, clock=time.time):
+    """
+    Decode an MQTT message into machine data rows.
+
+    Legacy messages carry one value on a parameter topic; frames published on a
+    machine's frame topic are decoded into one row per parameter in a single step.
+    Rows are stamped with the source timestamp of the message, or with the arrival
+    time if the publisher did not provide one.
+
+    :param tracker: Optional SequenceTracker accounting for the message's sequence
+        number and ingest lag.
+    :param clock: Function returning the arrival time in epoch seconds.
+    :return: List of (machine_name, topic, value, unit, timestamp) rows, empty if the
+        topic does not belong to a registered machine.
+    """
+    arrival_epoch = clock()
+    entry = registry.lookup_topic(msg.topic)
+    if entry is None:
+        machine = registry.lookup_frame_topic(msg.topic)
+        if machine is None:
+            logging.debug("Ignoring message on unregistered topic '%s'.", msg.topic)
+            return []
+        try:
+            seq, rows = decode_frame(machine, msg.payload)
+        except FrameDecodeError as exc:
+            logging.warning("Dropping frame on topic '%s': %s", msg.topic, exc)
+            return []
+        if tracker is not None and rows:
+            tracker.observe(msg.topic, seq, to_epoch(rows[0][4]), arrival_epoch)
+        return rows
+
+    source_epoch, seq, session = read_message_properties(msg)
+    if tracker is not None:
+        tracker.observe(msg.topic, seq, source_epoch, arrival_epoch, session)
+    timestamp = from_epoch(source_epoch if source_epoch is not None else arrival_epoch)
+    value = decode_value(msg.payload)
+    return [(entry.machine, msg.topic, value, entry.unit, timestamp)]
+
+
+class MqttIngest:
+    """
+    Subscribes topic filters over a fixed pool of MQTT clients.
+
+    Filters are spread across the connections so that every message is delivered
+    exactly once; ``on_message`` receives all of them and dispatches by topic. With a
+    ``share_group`` the filters are subscribed as MQTTv5 shared subscriptions, so the
+    broker load-balances messages between every subscriber of the group.
+    """
+
+    def __init__(self, on_message, broker, port, connections=1,
+                 client_id_prefix="simulator-ingest", share_group=None):
+        self.on_message = on_message
+        self.broker = broker
+        self.port = port
+        self.connections = max(1, connections)
+        self.client_id_prefix = client_id_prefix
+        self.share_group = share_group
+        self._clients = []
+        self._assignments = {}
+        self._lock = threading.Lock()
+
+    def start(self, filters):
+        """Connect the clients and subscribe the given filters."""
+        for index in range(self.connections):
+            client = mqtt.Client(
+                client_id=f"{self.client_id_prefix}-{index}", protocol=mqtt.MQTTv5
+            )
+            client.on_message = self.on_message
+            client.on_connect = self._handle_connect
+            self._assignments[client] = []
+            client.connect(self.broker, self.port)
+            client.loop_start()
+            self._clients.append(client)
+        self.update_filters(filters)
+        logging.info(
+            "Multiplexed ingest started with %d connection(s) to %s:%s.",
+            len(self._clients), self.broker, self.port
+        )
+
+    def update_filters(self, filters):
+        """Subscribe filters that are not subscribed yet, balancing them across the clients."""
+        with self._lock:
+            assigned = {f for client_filters in self._assignments.values() for f in client_filters}
+            for topic_filter in filters:
+                if topic_filter in assigned:
+                    continue
+                client = min(self._clients, key=lambda c: len(self._assignments[c]))
+                self._assignments[client].append(topic_filter)
+                client.subscribe(self._subscription(topic_filter))
+                logging.info("Ingest subscribed to '%s'.", self._subscription(topic_filter))
+
+    def stop(self):
+        """Disconnect every client."""
+        for client in self._clients:
+            client.loop_stop()
+            client.disconnect()
+        self._clients = []
+        self._assignments = {}
+
+    def _handle_connect(self, client, _userdata, _flags, reason_code, _properties=None):
+        """Restore the client's subscriptions after a (re)connect."""
+        if reason_code != 0:
+            logging.error("Ingest connection failed: %s", reason_code)
+            return
+        with self._lock:
+            for topic_filter in self._assignments.get(client, []):
+                client.subscribe(self._subscription(topic_filter))
+
+    def _subscription(self, topic_filter):
+        """Return the subscription string of a filter, shared if a group is configured."""
+        if self.share_group:
+            return f"$share/{self.share_group}/{topic_filter}"
+        return topic_filter
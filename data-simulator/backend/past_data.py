@@ -0,0 +1,228 @@
+"""
+Generation of past machine data for the API: request parsing, storing, streaming and
+the runner of background backfill jobs.
+"""
+
+import csv
+import datetime
+import io
+import json
+import logging
+
+import psycopg2  # type: ignore
+
+from backfill import COPY_VALUE_FORMAT, iter_backfill_chunks  # type: ignore
+from bulk_loader import BulkLoader  # type: ignore
+from database_configuration import DatabaseConnectionError, db_connection  # type: ignore
+from machine_registry import get_registry  # type: ignore
+
+# Response formats of /generate-past-data; every format but 'json' is streamed.
+PAST_DATA_MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+PAST_DATA_CSV_FIELDS = ("timestamp", "machine_name", "parameter", "topic", "value", "unit")
+
+
+def naive_utc(value):
+    """Convert a timezone-aware datetime to naive UTC; naive datetimes are taken as UTC."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def parse_past_data_request(data):
+    """
+    Validate a past data request body.
+
+    Dates with a UTC offset are converted to UTC; dates without one are taken as UTC.
+
+    :return: Tuple of machine name, naive UTC start and end datetimes and interval in seconds.
+    :raises ValueError: With a message for the client if the request is invalid.
+    """
+    data = data or {}
+    machine_name = data.get("machine_name")
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    interval_seconds = data.get("interval_seconds", 60)
+
+    if not machine_name or not start_date or not end_date:
+        raise ValueError("Missing required parameters")
+
+    try:
+        start_time = naive_utc(datetime.datetime.fromisoformat(start_date))
+        end_time = naive_utc(datetime.datetime.fromisoformat(end_date))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid date format") from exc
+
+    if start_time >= end_time:
+        raise ValueError("Start date must be before end date")
+
+    if not isinstance(interval_seconds, (int, float)) or interval_seconds <= 0:
+        raise ValueError("Interval must be a positive number of seconds")
+    return machine_name, start_time, end_time, interval_seconds
+
+
+def generate_past_data(machine_name, start_time, end_time, interval_seconds, starting_values):
+    """
+    Generate machine data for the specified machine within a date range in the past and log it.
+
+    :param machine_name: Name of the machine.
+    :param start_time: Start datetime for data generation.
+    :param end_time: End datetime for data generation.
+    :param interval_seconds: Interval in seconds between data points.
+    :param starting_values: Values the machine's parameters start from.
+    :return: List of generated data entries.
+    :raises DatabaseConnectionError: If no connection is available.
+    :raises psycopg2.Error: If storing the rows fails; nothing is stored then.
+    """
+    generated_data = []
+    for rows in iter_past_data(
+            machine_name, start_time, end_time, interval_seconds, starting_values):
+        generated_data.extend(row_entry(row) for row in rows)
+    return generated_data
+
+
+def iter_past_data(machine_name, start_time, end_time, interval_seconds, starting_values):
+    """
+    Generate and store past data for a machine, yielding the rows of one chunk at a time.
+
+    Rows are committed as the bulk loader's transactions fill up and the rest once the
+    generator is exhausted; rows of a generator closed early are rolled back.
+
+    :raises DatabaseConnectionError: On the first next() if no connection is available.
+    :raises psycopg2.Error: If storing the rows fails.
+    """
+    entry = get_registry().machine(machine_name)
+    if entry is None or not entry.ranges:
+        logging.warning("Machine '%s' has no parameter ranges. Skipping past data.", machine_name)
+        return
+
+    with db_connection() as conn:
+        loader = BulkLoader(conn)
+        for chunk in iter_backfill_chunks(
+                entry.ranges, starting_values, start_time, end_time, interval_seconds):
+            columns = stored_columns(entry, chunk.parameters)
+            loader.write_columns(
+                entry.name, copy_columns(columns), chunk.timestamps, chunk.values,
+                COPY_VALUE_FORMAT,
+            )
+            yield chunk_rows(entry, chunk, columns)
+        stats = loader.finish()
+        logging.info(
+            "Generated %d past data rows for %s from %s to %s (%.0f rows/s stored)",
+            stats["rows"], machine_name, start_time, end_time, stats["rows_per_second"]
+        )
+
+
+def stored_columns(entry, parameters):
+    """Return (column, registry parameter entry) of the parameters that have a topic."""
+    columns = []
+    for column, parameter in enumerate(parameters):
+        parameter_entry = get_registry().lookup_parameter(entry.name, parameter)
+        if parameter_entry is not None and parameter_entry.topic:
+            columns.append((column, parameter_entry))
+    return columns
+
+
+def copy_columns(columns):
+    """Return the (column, topic, unit) list BulkLoader.write_columns() takes."""
+    return [(column, entry.topic, entry.unit) for column, entry in columns]
+
+
+def chunk_rows(entry, chunk, columns=None):
+    """
+    Turn a BackfillChunk of a machine into machine data rows, timestamp by timestamp.
+
+    Only needed to return rows to API clients; storing goes through write_columns().
+    """
+    if columns is None:
+        columns = stored_columns(entry, chunk.parameters)
+    timestamps = chunk.timestamps.astype("datetime64[us]").tolist()
+    return [
+        (entry.name, parameter_entry.topic, values[column], parameter_entry.unit, timestamp)
+        for timestamp, values in zip(timestamps, chunk.values.tolist())
+        for column, parameter_entry in columns
+    ]
+
+
+def stream_past_data(chunks, first_rows, output_format):
+    """
+    Yield generated rows as NDJSON lines or CSV text, one chunk at a time.
+
+    If storing fails mid-stream the response ends with an error record: an
+    ``{"error": ...}`` line for NDJSON, a ``# error: ...`` line for CSV.
+    """
+    if output_format == "csv":
+        yield ",".join(PAST_DATA_CSV_FIELDS) + "\n"
+    try:
+        rows = first_rows
+        while rows is not None:
+            entries = (row_entry(row) for row in rows)
+            if output_format == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, PAST_DATA_CSV_FIELDS, lineterminator="\n")
+                writer.writerows(entries)
+                yield buffer.getvalue()
+            else:
+                yield "".join(json.dumps(entry) + "\n" for entry in entries)
+            rows = next(chunks, None)
+    except (DatabaseConnectionError, psycopg2.Error) as exc:
+        logging.error("Error streaming past data: %s", exc)
+        if output_format == "csv":
+            yield "# error: " + " ".join(str(exc).split()) + "\n"
+        else:
+            yield json.dumps({"error": str(exc)}) + "\n"
+
+
+def row_entry(row):
+    """Return the API representation of a generated machine data row."""
+    machine_name, topic, value, unit, timestamp = row
+    return {
+        "machine_name": machine_name,
+        "topic": topic,
+        "parameter": get_registry().lookup_topic(topic).parameter,
+        "value": value,
+        "unit": unit,
+        "timestamp": timestamp.isoformat(),
+    }
+
+
+def run_backfill_job(job, starting_values):
+    """
+    Write a backfill job's rows from its resume point one chunk at a time.
+
+    Each chunk is yielded uncommitted together with the loader's commit, so that the
+    job manager can record the chunk as pending before committing it.
+    """
+    entry = get_registry().machine(job.machine_name)
+    if entry is None or not entry.ranges:
+        raise ValueError(f"Machine '{job.machine_name}' has no parameter ranges.")
+    step = datetime.timedelta(seconds=job.interval_seconds)
+    columns = copy_columns(stored_columns(entry, list(entry.ranges)))
+
+    with db_connection() as conn:
+        loader = BulkLoader(conn, transaction_rows=0)
+        for chunk in iter_backfill_chunks(
+                entry.ranges, starting_values,
+                datetime.datetime.fromisoformat(job.resume_from),
+                datetime.datetime.fromisoformat(job.end_time), job.interval_seconds):
+            loader.write_columns(
+                entry.name, columns, chunk.timestamps, chunk.values, COPY_VALUE_FORMAT
+            )
+            next_start = chunk.timestamps[-1].astype("datetime64[us]").item() + step
+            yield next_start.isoformat(), len(chunk.timestamps) * len(columns), loader.commit
+
+
+def backfill_chunk_committed(job):
+    """Return whether the last timestamp of a job's pending chunk is stored for its machine."""
+    step = datetime.timedelta(seconds=job.interval_seconds)
+    last_timestamp = datetime.datetime.fromisoformat(job.pending["resume_from"]) - step
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM machine_data WHERE machine_name = %s AND timestamp = %s LIMIT 1",
+                (job.machine_name, last_timestamp),
+            )
+            return cur.fetchone() is not None
@@ -0,0 +1,125 @@
+"""
+Per-machine frames carrying every parameter of a machine in a single MQTT message.
+
+Two encodings are supported:
+
+* JSON: ``{"ts":<epoch seconds>,"seq":<n>,"v":{"<parameter>":<value>,...}}`` with
+  compact separators.
+* Binary: a fixed little-endian header ``magic(2s) version(B) count(B) layout(I) seq(Q)
+  ts(d)`` followed by ``count`` float64 values in the machine's configured parameter order.
+  ``layout`` is a CRC32 of the parameter names, so frames published with a different
+  machine configuration are rejected instead of being decoded into the wrong parameters.
+  Missing values are sent as NaN.
+"""
+
+import datetime
+import json
+import math
+import struct
+import zlib
+
+FRAME_FORMATS = ("json", "binary")
+BINARY_MAGIC = b"MF"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<2sBBIQd")
+_VALUE_STRUCTS = {}
+
+
+class FrameDecodeError(ValueError):
+    """Exception raised when a frame cannot be decoded."""
+
+
+def frame_layout(entry):
+    """Return the layout id of a machine, a CRC32 of its parameter names in order."""
+    names = "\x1f".join(parameter.parameter or "" for parameter in entry.parameters)
+    return zlib.crc32(names.encode("utf-8"))
+
+
+def _value_struct(count):
+    """Return a cached struct packing ``count`` float64 values."""
+    value_struct = _VALUE_STRUCTS.get(count)
+    if value_struct is None:
+        value_struct = _VALUE_STRUCTS[count] = struct.Struct(f"<{count}d")
+    return value_struct
+
+
+def to_epoch(timestamp):
+    """Convert a naive UTC datetime into epoch seconds."""
+    return timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def from_epoch(seconds):
+    """Convert epoch seconds into a naive UTC datetime."""
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def encode_frame(entry, parameters, timestamp, frame_format, seq=0):
+    """
+    Encode the generated parameters of a machine into a frame.
+
+    :param entry: MachineEntry of the machine.
+    :param parameters: Mapping of parameter name to value.
+    :param timestamp: Naive UTC datetime the values were generated at.
+    :param frame_format: 'json' or 'binary'.
+    :param seq: Sequence number of the frame on the machine's frame topic.
+    """
+    if frame_format == "json":
+        values = {name: float(value) for name, value in parameters.items()}
+        frame = {"ts": to_epoch(timestamp), "seq": seq, "v": values}
+        return json.dumps(frame, separators=(",", ":"))
+    if frame_format == "binary":
+        count = len(entry.parameters)
+        values = [float(parameters.get(p.parameter, math.nan)) for p in entry.parameters]
+        header = BINARY_HEADER.pack(
+            BINARY_MAGIC, BINARY_VERSION, count, frame_layout(entry), seq, to_epoch(timestamp)
+        )
+        return header + _value_struct(count).pack(*values)
+    raise ValueError(f"Unknown frame format '{frame_format}'.")
+
+
+def decode_frame(entry, payload):
+    """
+    Decode a frame of either encoding into machine data rows.
+
+    :return: Tuple of the frame's sequence number and its list of
+        (machine_name, topic, value, unit, timestamp) rows.
+    :raises FrameDecodeError: If the payload is not a valid frame for the machine.
+    """
+    if payload[:2] == BINARY_MAGIC:
+        seq, timestamp, values = _decode_binary(entry, payload)
+    else:
+        seq, timestamp, values = _decode_json(payload)
+    rows = []
+    for parameter in entry.parameters:
+        value = values.get(parameter.parameter)
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            continue
+        rows.append((entry.name, parameter.topic, value, parameter.unit, timestamp))
+    return seq, rows
+
+
+def _decode_binary(entry, payload):
+    """Decode a binary frame into its sequence number, timestamp and parameter values."""
+    if len(payload) < BINARY_HEADER.size:
+        raise FrameDecodeError("Binary frame is shorter than its header.")
+    _, version, count, layout, seq, seconds = BINARY_HEADER.unpack_from(payload)
+    if version != BINARY_VERSION:
+        raise FrameDecodeError(f"Unsupported binary frame version {version}.")
+    if count != len(entry.parameters) or layout != frame_layout(entry):
+        raise FrameDecodeError(f"Binary frame layout does not match machine '{entry.name}'.")
+    value_struct = _value_struct(count)
+    if len(payload) != BINARY_HEADER.size + value_struct.size:
+        raise FrameDecodeError("Binary frame has an unexpected length.")
+    values = value_struct.unpack_from(payload, BINARY_HEADER.size)
+    names = (parameter.parameter for parameter in entry.parameters)
+    return seq, from_epoch(seconds), dict(zip(names, values))
+
+
+def _decode_json(payload):
+    """Decode a JSON frame into its sequence number, timestamp and parameter values."""
+    try:
+        frame = json.loads(payload)
+        seq = int(frame["seq"]) if "seq" in frame else None
+        return seq, from_epoch(float(frame["ts"])), dict(frame["v"])
+    except (ValueError, TypeError, KeyError) as exc:
+        raise FrameDecodeError(f"Invalid JSON frame: {exc}") from exc
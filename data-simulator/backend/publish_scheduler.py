@@ -0,0 +1,182 @@
+"""
+Drift-free publish scheduling with per-machine intervals.
+
+Every machine has a fixed grid of absolute deadlines ``base + k * interval``, so the
+time spent generating and publishing never shifts later ticks. ``base`` is the
+scheduler's start plus an optional phase offset, which is a stable fraction of the
+interval derived from the machine name. Phase offsets spread machines sharing an
+interval across it instead of waking them all at once. A random jitter of up to
+``jitter`` seconds may be added to each tick without moving the grid.
+
+When a tick fires more than ``late_tolerance`` seconds after its time it counts as
+late. If whole deadlines have passed, the ``catch_up`` policy decides what happens:
+'skip' drops them and continues with the next future deadline, 'burst' publishes
+every missed tick back to back.
+"""
+
+import heapq
+import math
+import random
+import threading
+import time
+import zlib
+
+CATCH_UP_POLICIES = ("skip", "burst")
+
+
+class PublishScheduler:
+    """
+    Min-heap of per-key deadlines on a monotonic clock.
+
+    :param interval_for: Callable returning the publish interval of a key in seconds.
+    :param phase: Spread keys across their interval with a stable per-key offset.
+    :param jitter: Maximum random delay added to each tick, in seconds.
+    :param catch_up: 'skip' or 'burst', see the module docstring.
+    :param late_tolerance: Delay in seconds after which a tick counts as late.
+    :param clock: Monotonic clock returning seconds.
+    :param sleep: Function sleeping for a number of seconds.
+    :param wait: Function (event, seconds) waiting on a threading.Event for at most a
+        number of seconds; defaults to ``event.wait``.
+    """
+
+    def __init__(self, interval_for, phase=True, jitter=0.0, catch_up="skip",
+                 late_tolerance=0.5, clock=time.monotonic, sleep=time.sleep, rng=None, wait=None):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{catch_up}'.")
+        self.interval_for = interval_for
+        self.phase = phase
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.late_tolerance = late_tolerance
+        self.clock = clock
+        self.sleep = sleep
+        self.wait = wait or (lambda event, seconds: event.wait(seconds))
+        self.rng = rng or random.Random()
+        self._start = clock()
+        self._heap = []
+        # key -> [interval, base, tick index, generation]
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "ticks": 0,
+            "late_ticks": 0,
+            "skipped_deadlines": 0,
+            "burst_ticks": 0,
+            "max_lateness_ms": 0.0,
+            "total_lateness_ms": 0.0,
+        }
+
+    def sync(self, keys):
+        """Schedule keys that are not scheduled yet and forget keys that are gone."""
+        keys = set(keys)
+        for key in list(self._entries):
+            if key not in keys:
+                self.remove(key)
+        for key in keys:
+            if key not in self._entries:
+                self.add(key)
+
+    def add(self, key):
+        """Schedule a key from its next deadline on."""
+        interval = float(self.interval_for(key))
+        if interval <= 0:
+            raise ValueError(f"Publish interval of '{key}' must be positive.")
+        offset = 0.0
+        if self.phase:
+            offset = zlib.crc32(str(key).encode("utf-8")) / 2 ** 32 * interval
+        base = self._start + offset
+        tick = max(0, math.ceil((self.clock() - base) / interval))
+        self._generation += 1
+        self._entries[key] = [interval, base, tick, self._generation]
+        self._push(key)
+
+    def remove(self, key):
+        """Stop scheduling a key; its queued deadline is discarded when reached."""
+        self._entries.pop(key, None)
+
+    def next_delay(self):
+        """Return the seconds until the earliest tick, or None if nothing is scheduled."""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """Return the keys whose tick has come, each at most once, and schedule their next tick."""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            if not self._is_current(item):
+                continue
+            fire_time, key = item[0], item[2]
+            due.append(key)
+            self._record(now - fire_time)
+        for key in due:
+            entry = self._entries[key]
+            interval, base = entry[0], entry[1]
+            entry[2] += 1
+            missed = math.floor((now - (base + entry[2] * interval)) / interval) + 1
+            if missed > 0:
+                with self._lock:
+                    if self.catch_up == "skip":
+                        entry[2] += missed
+                        self._stats["skipped_deadlines"] += missed
+                    else:
+                        self._stats["burst_ticks"] += 1
+            self._push(key)
+        return due
+
+    def wait_due(self, stop_event=None):
+        """Sleep until keys are due and return them; [] if nothing is scheduled or on stop."""
+        while True:
+            delay = self.next_delay()
+            if delay is None:
+                self.sleep(1.0)
+                return []
+            if delay <= 0:
+                due = self.pop_due()
+                if due:
+                    return due
+                continue
+            if stop_event is not None:
+                if self.wait(stop_event, delay):
+                    return []
+            else:
+                self.sleep(delay)
+
+    def stats(self):
+        """Return tick, lateness and missed deadline counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        total_lateness_ms = stats.pop("total_lateness_ms")
+        stats["avg_lateness_ms"] = (
+            round(total_lateness_ms / stats["ticks"], 3) if stats["ticks"] else 0.0
+        )
+        stats["max_lateness_ms"] = round(stats["max_lateness_ms"], 3)
+        stats["scheduled"] = len(self._entries)
+        return stats
+
+    def _push(self, key):
+        """Queue the current tick of a key."""
+        interval, base, tick, generation = self._entries[key]
+        deadline = base + tick * interval
+        fire_time = deadline + (self.rng.uniform(0.0, self.jitter) if self.jitter else 0.0)
+        heapq.heappush(self._heap, (fire_time, generation, key))
+
+    def _is_current(self, item):
+        """Return whether a heap item belongs to a key's current schedule."""
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[3] == item[1]
+
+    def _record(self, lateness):
+        """Account for a tick that fired ``lateness`` seconds after its time."""
+        lateness_ms = max(0.0, lateness * 1000.0)
+        with self._lock:
+            self._stats["ticks"] += 1
+            self._stats["total_lateness_ms"] += lateness_ms
+            self._stats["max_lateness_ms"] = max(self._stats["max_lateness_ms"], lateness_ms)
+            if lateness > self.late_tolerance:
+                self._stats["late_ticks"] += 1
@@ -0,0 +1,205 @@
+"""
+Source timestamps and per-topic sequence numbers for loss and lag accounting.
+
+Legacy messages keep their bare payload and carry the generation time and sequence
+number as MQTTv5 user properties ``ts`` (epoch seconds) and ``seq``, plus the
+publisher's session id ``sid``. Frames embed the timestamp and sequence number.
+
+Sequences restart at 0 when a publisher restarts. The tracker starts a new epoch for
+a topic when its session id changes or, for frames, when sequence 0 arrives again.
+"""
+
+import bisect
+import itertools
+import threading
+import uuid
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+# Number of sequence numbers below the highest one seen that are remembered per topic,
+# to tell duplicates from late (reordered) arrivals.
+SEQUENCE_WINDOW = 64
+# Upper bounds of the lag histogram buckets in milliseconds; the last bucket is open.
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+
+class PublishSequencer:
+    """Hands out monotonically increasing sequence numbers per topic within one session."""
+
+    def __init__(self):
+        self.session = uuid.uuid4().hex[:12]
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def next(self, topic):
+        """Return the next sequence number of a topic, starting at 0."""
+        counter = self._counters.get(topic)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(topic, itertools.count())
+        return next(counter)
+
+
+def message_properties(source_epoch, seq, session=None):
+    """Build the MQTTv5 PUBLISH properties carrying a source timestamp, sequence number and session."""
+    properties = Properties(PacketTypes.PUBLISH)
+    properties.UserProperty = [("ts", f"{source_epoch:.6f}"), ("seq", str(seq))]
+    if session is not None:
+        properties.UserProperty.append(("sid", session))
+    return properties
+
+
+def read_message_properties(msg):
+    """Return the (source_epoch, seq, session) carried by a message's user properties, or Nones."""
+    properties = getattr(msg, "properties", None)
+    user_properties = getattr(properties, "UserProperty", None) if properties else None
+    if not user_properties:
+        return None, None, None
+    values = dict(user_properties)
+    try:
+        source_epoch = float(values["ts"]) if "ts" in values else None
+        seq = int(values["seq"]) if "seq" in values else None
+    except ValueError:
+        return None, None, None
+    return source_epoch, seq, values.get("sid")
+
+
+class _TopicSequence:
+    """Sequence state of one topic: highest sequence seen and a bitmap window below it."""
+
+    __slots__ = ("highest", "window", "session", "received", "missing", "duplicates",
+                 "reordered", "resets")
+
+    def __init__(self, seq, session=None):
+        self.highest = seq
+        self.session = session
+        self.window = 1
+        self.received = 1
+        self.missing = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.resets = 0
+
+    def observe(self, seq, session=None):
+        """Account for one received sequence number."""
+        self.received += 1
+        restarted = session != self.session if session is not None else seq == 0
+        if restarted and (seq < self.highest or session is not None):
+            # The publisher restarted: start a new epoch instead of counting duplicates.
+            self.resets += 1
+            self.highest = seq
+            self.window = 1
+            self.session = session
+            return
+        if seq > self.highest:
+            shift = seq - self.highest
+            self.missing += shift - 1
+            self.window = ((self.window << shift) | 1) & ((1 << SEQUENCE_WINDOW) - 1)
+            self.highest = seq
+            return
+        offset = self.highest - seq
+        if offset >= SEQUENCE_WINDOW:
+            # Far behind the window: the publisher restarted its sequence.
+            self.resets += 1
+            self.highest = seq
+            self.window = 1
+            return
+        bit = 1 << offset
+        if self.window & bit:
+            self.duplicates += 1
+            return
+        self.window |= bit
+        self.reordered += 1
+        self.missing = max(0, self.missing - 1)
+
+    def as_dict(self):
+        """Return the counters of the topic."""
+        return {
+            "highest_seq": self.highest,
+            "received": self.received,
+            "missing": self.missing,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "resets": self.resets,
+        }
+
+
+class SequenceTracker:
+    """
+    Per-topic gap, duplicate and reorder counters plus an ingest lag histogram.
+
+    With ``track_sequences`` disabled only the lag is recorded, which is what a member
+    of a shared subscription group can measure since it sees only part of each topic.
+    """
+
+    def __init__(self, track_sequences=True):
+        self.track_sequences = track_sequences
+        self._topics = {}
+        self._lag_counts = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self._lag_count = 0
+        self._lag_sum_ms = 0.0
+        self._lag_max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, topic, seq, source_epoch, arrival_epoch, session=None):
+        """
+        Account for a message that arrived at ``arrival_epoch`` (epoch seconds).
+
+        :param session: Session id of the publisher, if the message carries one.
+        """
+        with self._lock:
+            if self.track_sequences and seq is not None:
+                state = self._topics.get(topic)
+                if state is None:
+                    self._topics[topic] = _TopicSequence(seq, session)
+                else:
+                    state.observe(seq, session)
+            if source_epoch is not None:
+                lag_ms = max(0.0, (arrival_epoch - source_epoch) * 1000.0)
+                self._lag_counts[bisect.bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+                self._lag_count += 1
+                self._lag_sum_ms += lag_ms
+                self._lag_max_ms = max(self._lag_max_ms, lag_ms)
+
+    def stats(self, include_topics=False):
+        """Return sequence totals and the lag distribution, optionally per topic."""
+        with self._lock:
+            topics = {topic: state.as_dict() for topic, state in self._topics.items()}
+            lag_counts = list(self._lag_counts)
+            lag_count, lag_sum_ms, lag_max_ms = self._lag_count, self._lag_sum_ms, self._lag_max_ms
+        totals = {"topics": len(topics)}
+        for key in ("received", "missing", "duplicates", "reordered", "resets"):
+            totals[key] = sum(counters[key] for counters in topics.values())
+        buckets = [
+            {"le_ms": bound, "count": count}
+            for bound, count in zip(list(LAG_BUCKETS_MS) + [None], lag_counts)
+        ]
+        result = {
+            "sequence": totals,
+            "lag": {
+                "count": lag_count,
+                "avg_ms": round(lag_sum_ms / lag_count, 3) if lag_count else 0.0,
+                "max_ms": round(lag_max_ms, 3),
+                "p50_ms": _bucket_percentile(lag_counts, lag_count, 0.50),
+                "p90_ms": _bucket_percentile(lag_counts, lag_count, 0.90),
+                "p99_ms": _bucket_percentile(lag_counts, lag_count, 0.99),
+                "buckets": buckets,
+            },
+        }
+        if include_topics:
+            result["per_topic"] = topics
+        return result
+
+
+def _bucket_percentile(counts, total, quantile):
+    """Return the upper bound of the histogram bucket holding a quantile, None if open."""
+    if not total:
+        return 0.0
+    rank = quantile * total
+    cumulative = 0
+    for bound, count in zip(LAG_BUCKETS_MS, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return bound
+    return None
@@ -0,0 +1,98 @@
+"""
+Simulator configuration file.
+"""
+
+import os
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Machine starting values and settings written by ui.py and read by app.py and
+# fleet_backfill.py, next to the scripts whatever directory they are started from.
+CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
+
+# GENERATION_ENGINE: 'vectorized' advances the whole fleet in one NumPy step per tick,
+# 'scalar' generates each machine parameter by parameter, 'trace' replays TRACE_FILE
+# (see trace_replay.py) and generates vectorized values for parameters it does not cover.
+GENERATION_ENGINE = 'vectorized'
+
+# Trace replay: TRACE_OFFSET_S seconds into the trace at simulation start, looping at its
+# end (or holding its last record), optionally interpolating between records.
+# TRACE_TOPIC_MAP maps registry topics onto trace topics recorded under another name.
+TRACE_FILE = os.path.join(SCRIPT_DIR, "traces", "machines.trace")
+TRACE_OFFSET_S = 0.0
+TRACE_LOOP = True
+TRACE_INTERPOLATE = False
+TRACE_TOPIC_MAP = {}
+
+# Virtual machines expanded in memory from a configured machine type, for load tests.
+# Each template yields 'count' machines named '<template>-<n>' with ids from 'first_id'
+# that publish on 'ZG/<first three letters of the template>/<id>/<PARAMETER>'.
+# 'jitter_percent' moves every instance's starting values by up to that percentage of
+# the range midpoint, reproducibly for a given 'seed'. Large fleets need PUBLISH_MODE
+# 'shared' or its fallback below and INGEST_MODE 'multiplexed'. Example:
+# 'VirtualDrill': {'machine_type': 'DrillingMachine', 'count': 1000, 'first_id': 1000,
+#                  'jitter_percent': 5.0, 'seed': 0},
+MACHINE_TEMPLATES = {}
+
+# Publish schedule: every machine publishes every PUBLISH_INTERVAL_S seconds unless
+# PUBLISH_INTERVALS has an entry for its name or its template. Ticks follow absolute
+# deadlines. PUBLISH_PHASE_SPREAD offsets machines across their interval, and
+# PUBLISH_JITTER_S adds up to that many seconds of random delay to each tick. A tick
+# more than PUBLISH_LATE_TOLERANCE_S late counts as late. When whole deadlines are
+# missed, PUBLISH_CATCH_UP 'skip' drops them and 'burst' publishes them back to back.
+PUBLISH_INTERVAL_S = 15.0
+PUBLISH_INTERVALS = {}
+PUBLISH_PHASE_SPREAD = True
+PUBLISH_JITTER_S = 0.0
+PUBLISH_LATE_TOLERANCE_S = 0.5
+PUBLISH_CATCH_UP = 'skip'
+
+# Live simulation on a virtual clock: time runs SIMULATION_SPEEDUP times faster than real
+# time (e.g. 60 or 3600), starting at SIMULATION_START (naive UTC ISO timestamp, None for
+# now). Publish intervals, deadband heartbeats and message timestamps all follow virtual
+# time, and so do the ingest lag measured by app.py and the publish lateness statistics.
+SIMULATION_SPEEDUP = 1.0
+SIMULATION_START = None
+
+# Number of timestamps generated and written together when backfilling past data.
+BACKFILL_CHUNK_SIZE = 10000
+
+# Background backfill jobs: number running at once, where their state is kept and
+# whether jobs interrupted by a restart are resumed from their last committed chunk.
+BACKFILL_MAX_WORKERS = 2
+BACKFILL_JOB_DIRECTORY = os.path.join(SCRIPT_DIR, "backfill_jobs")
+BACKFILL_RESUME_ON_START = True
+
+# fleet_backfill.py: length of the time shards each machine's range is cut into and
+# the default number of worker processes.
+BACKFILL_SHARD_SECONDS = 7 * 24 * 3600
+FLEET_BACKFILL_WORKERS = os.cpu_count() or 1
+
+# simulator_shards.py: default number of simulator processes, how often each reports its
+# throughput and how long the launcher waits before restarting a crashed one.
+SIMULATOR_SHARDS = os.cpu_count() or 1
+SHARD_STATS_INTERVAL_S = 10.0
+SHARD_RESTART_DELAY_S = 5.0
+
+# Number of samples averaged when smoothing generated values. Parameters keep the
+# default window unless given their own, e.g. {'Temperature': 10}.
+DEFAULT_SMOOTHING_WINDOW = 5
+SMOOTHING_WINDOWS = {}
+
+# Periodically save current values and smoothing histories so that a restart resumes
+# every parameter where it left off instead of going back to its starting value.
+STATE_CHECKPOINT_ENABLED = False
+STATE_CHECKPOINT_FILE = os.path.join(SCRIPT_DIR, "simulator_state.json")
+STATE_CHECKPOINT_INTERVAL_S = 60.0
+
+# Report-by-exception (deadband) settings, keyed by parameter name. A value is reported
+# only when it moves more than max('absolute', 'percent' % of the last reported value)
+# away from the last reported value, or when 'max_silence_s' seconds have passed since.
+DEADBAND_PUBLISH_ENABLED = False
+# The ingest deadband applies to the Flask app only; ingest_worker.py refuses to start with it.
+DEADBAND_INGEST_ENABLED = False
+DEFAULT_DEADBAND = {'absolute': 0.0, 'percent': 1.0, 'max_silence_s': 60.0}
+DEADBANDS = {
+    'Temperature': {'absolute': 2.0, 'percent': 0.0, 'max_silence_s': 60.0},
+    'DrillingSpeed': {'absolute': 10.0, 'percent': 0.0, 'max_silence_s': 60.0},
+}
@@ -0,0 +1,214 @@
+"""
+Multi-process simulator launcher with consistent machine partitioning.
+
+Run ``python simulator_shards.py --shards 8`` to generate and publish the fleet on
+eight worker processes, next to app.py with PUBLISH_ENGINE = 'none'. Each machine
+belongs to shard ``crc32(name) % shards``, so a machine always lands on the same
+worker. Every worker owns the generation state and random stream of its machines,
+its own publish scheduler and one broker connection, and reports its throughput to
+the launcher over a queue. The launcher restarts workers that exit; a restarted
+worker continues its machines from their starting values.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import queue
+import time
+import zlib
+
+import numpy as np
+
+from simulator_configuration import (  # type: ignore
+    SHARD_RESTART_DELAY_S,
+    SHARD_STATS_INTERVAL_S,
+    SIMULATOR_SHARDS,
+)
+
+
+def shard_of(machine_name, shards):
+    """Return the shard a machine belongs to."""
+    return zlib.crc32(machine_name.encode("utf-8")) % shards
+
+
+def shard_machines(registry, index, shards):
+    """Return the names of the registry's machines that belong to shard ``index``."""
+    return [name for name in registry.machines if shard_of(name, shards) == index]
+
+
+def run_worker(index, shards, seed, restarts, anchor, stats_queue):
+    """Generate and publish the machines of one shard until the process is stopped."""
+    # Imported here so that the launcher itself never loads the Flask application.
+    import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+    import app as simulator  # type: ignore  # pylint: disable=import-outside-toplevel
+    from fleet_engine import FleetEngine  # type: ignore  # pylint: disable=import-outside-toplevel
+    from virtual_clock import create_clock  # type: ignore  # pylint: disable=import-outside-toplevel
+
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index, restarts)))
+    broker, port = simulator.get_publish_broker()
+    client = mqtt.Client(client_id=f"simulator-shard-{index}", protocol=mqtt.MQTTv5)
+    client.connect(broker, port)
+    client.loop_start()
+    # Every worker, including restarted ones, shares the launcher's virtual timeline.
+    simulator.CLOCK = create_clock(anchor)
+    scheduler = simulator.create_publish_scheduler(simulator.CLOCK)
+    engine = None
+    machines = []
+    registry_version = None
+    ticks = values = 0
+    window_ticks = window_values = 0
+    window_started = time.monotonic()
+    while True:
+        registry = simulator.get_registry()
+        if registry.version != registry_version:
+            config = simulator.load_configuration()
+            machines = shard_machines(registry, index, shards)
+            rebuilt = FleetEngine(
+                ((name, registry.machines[name].ranges,
+                  simulator.machine_starting_values(name, config))
+                 for name in machines if registry.machines[name].ranges),
+                rng=rng,
+            )
+            if engine is not None:
+                rebuilt.carry_over(engine)
+            engine = rebuilt
+            scheduler.sync(machines)
+            registry_version = registry.version
+            logging.info("Shard %d/%d owns %d machines.", index, shards, len(machines))
+        due = scheduler.wait_due()
+        parameters_by_machine = simulator.overlay_trace(engine.step_machines(due), due)
+        for machine, parameters in parameters_by_machine.items():
+            simulator.publish_machine_data(machine, parameters, client)
+            window_ticks += 1
+            window_values += len(parameters)
+        elapsed = time.monotonic() - window_started
+        if elapsed >= SHARD_STATS_INTERVAL_S:
+            ticks += window_ticks
+            values += window_values
+            stats_queue.put((index, {
+                "machines": len(machines),
+                "ticks": ticks,
+                "values": values,
+                "ticks_per_second": round(window_ticks / elapsed, 1),
+                "values_per_second": round(window_values / elapsed, 1),
+                "scheduler": scheduler.stats(),
+            }))
+            window_ticks = window_values = 0
+            window_started = time.monotonic()
+
+
+def aggregate_stats(shard_stats):
+    """Sum the latest throughput reports of every shard."""
+    reports = list(shard_stats.values())
+    return {
+        "shards": len(reports),
+        "machines": sum(report["machines"] for report in reports),
+        "ticks_per_second": round(sum(report["ticks_per_second"] for report in reports), 1),
+        "values_per_second": round(sum(report["values_per_second"] for report in reports), 1),
+        "late_ticks": sum(report["scheduler"]["late_ticks"] for report in reports),
+    }
+
+
+class ShardSupervisor:
+    """
+    Starts one worker process per shard, restarts workers that exit and collects their stats.
+
+    :param shards: Number of worker processes.
+    :param seed: Seed of the workers' random streams, or None for fresh entropy.
+    :param restart_delay: Seconds to wait before restarting a worker that exited.
+    """
+
+    def __init__(self, shards, seed=None, restart_delay=SHARD_RESTART_DELAY_S):
+        self.shards = shards
+        self.seed = seed
+        self.restart_delay = restart_delay
+        self.context = multiprocessing.get_context("spawn")
+        self.stats_queue = self.context.Queue()
+        self.anchor = time.time()
+        self.processes = {}
+        self.restarts = dict.fromkeys(range(shards), 0)
+        self.exited_at = {}
+        self.shard_stats = {}
+
+    def start(self):
+        """Start every worker."""
+        for index in range(self.shards):
+            self._start_worker(index)
+
+    def supervise(self):
+        """Collect stats and restart exited workers until interrupted."""
+        last_report = time.monotonic()
+        while True:
+            try:
+                index, stats = self.stats_queue.get(timeout=1.0)
+                self.shard_stats[index] = stats
+            except queue.Empty:
+                pass
+            self._restart_exited()
+            if time.monotonic() - last_report >= SHARD_STATS_INTERVAL_S and self.shard_stats:
+                logging.info("Fleet throughput: %s", aggregate_stats(self.shard_stats))
+                last_report = time.monotonic()
+
+    def stop(self):
+        """Terminate every worker."""
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join()
+
+    def _start_worker(self, index):
+        """Start the worker process of a shard."""
+        process = self.context.Process(
+            target=run_worker,
+            args=(index, self.shards, self.seed, self.restarts[index], self.anchor,
+                  self.stats_queue),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self.processes[index] = process
+        logging.info("Started shard %d/%d (pid %d).", index, self.shards, process.pid)
+
+    def _restart_exited(self):
+        """Restart workers that have been gone for at least ``restart_delay`` seconds."""
+        now = time.monotonic()
+        for index, process in self.processes.items():
+            if process.is_alive():
+                continue
+            if index not in self.exited_at:
+                logging.error(
+                    "Shard %d exited with code %s; restarting in %.0f s.",
+                    index, process.exitcode, self.restart_delay
+                )
+                self.exited_at[index] = now
+                self.shard_stats.pop(index, None)
+            elif now - self.exited_at[index] >= self.restart_delay:
+                del self.exited_at[index]
+                self.restarts[index] += 1
+                self._start_worker(index)
+
+
+def main():
+    """Parse the command line and run the sharded simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--shards", type=int, default=SIMULATOR_SHARDS,
+                        help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random streams")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(processName)s - %(levelname)s - %(message)s",
+    )
+    supervisor = ShardSupervisor(args.shards, args.seed)
+    supervisor.start()
+    try:
+        supervisor.supervise()
+    except KeyboardInterrupt:
+        logging.info("Stopping %d shards.", args.shards)
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Constant-time weighted smoothing over a fixed-capacity ring buffer.
+
+The smoothed value is the average of the last ``window`` samples weighted linearly
+from 1 (oldest) to 2 (newest), as np.average(history, weights=np.linspace(1, 2, window)).
+When a sample is pushed, the plain and weighted sums are updated in O(1): every
+remaining sample ages by one slot and loses 1 / (window - 1) of weight, the oldest
+leaves with weight 1 and the newest enters with weight 2.
+"""
+
+from simulator_configuration import DEFAULT_SMOOTHING_WINDOW, SMOOTHING_WINDOWS  # type: ignore
+
+# Pushes between exact recomputations of the sums, bounding floating-point drift.
+RESYNC_INTERVAL = 4096
+
+
+def smoothing_window(parameter):
+    """Return the configured smoothing window of a parameter."""
+    return SMOOTHING_WINDOWS.get(parameter, DEFAULT_SMOOTHING_WINDOW)
+
+
+class SmoothingHistory:
+    """Ring buffer of the last ``window`` samples of a parameter with incremental weighted sums."""
+
+    __slots__ = ("window", "_values", "_position", "_sum", "_weighted_sum", "_step",
+                 "_total_weight", "_pushes")
+
+    def __init__(self, window, initial_value):
+        if window < 1:
+            raise ValueError("Smoothing window must be at least 1.")
+        self.window = window
+        self._values = [float(initial_value)] * window
+        self._position = 0
+        self._step = 1.0 / (window - 1) if window > 1 else 0.0
+        self._total_weight = 1.5 * window if window > 1 else 1.0
+        self._pushes = 0
+        self._resync()
+
+    @classmethod
+    def from_samples(cls, window, samples):
+        """Create a history from samples ordered oldest to newest, keeping the newest ``window``."""
+        samples = list(samples)[-window:]
+        history = cls(window, samples[0])
+        for sample in samples[1:]:
+            history.push(sample)
+        return history
+
+    def push(self, value):
+        """Replace the oldest sample with a new one."""
+        oldest = self._values[self._position]
+        self._values[self._position] = value
+        self._position = (self._position + 1) % self.window
+        if self.window == 1:
+            self._sum = self._weighted_sum = value
+            return
+        remaining = self._sum - oldest
+        self._weighted_sum += 2.0 * value - oldest - self._step * remaining
+        self._sum = remaining + value
+        self._pushes += 1
+        if self._pushes >= RESYNC_INTERVAL:
+            self._resync()
+
+    def smoothed(self):
+        """Return the weighted average of the samples."""
+        return self._weighted_sum / self._total_weight
+
+    def samples(self):
+        """Return the samples from oldest to newest."""
+        return self._values[self._position:] + self._values[:self._position]
+
+    def _resync(self):
+        """Recompute both sums exactly from the buffer."""
+        samples = self.samples()
+        self._sum = sum(samples)
+        self._weighted_sum = sum(
+            (1.0 + age * self._step) * sample for age, sample in enumerate(samples)
+        )
+        self._pushes = 0
@@ -0,0 +1,225 @@
+"""
+Append-only local journal holding ingested rows while the database is unavailable.
+"""
+
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+FAILED_SUFFIX = ".failed"
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class SpillJournal:
+    """
+    Segmented append-only journal of machine data rows.
+
+    Rows are appended as JSON lines to the active segment, which is sealed once it
+    grows past ``segment_max_bytes``. Sealed segments are replayed oldest first and
+    deleted only after their rows have been committed to the database.
+    """
+
+    def __init__(self, directory, segment_max_bytes, fsync_policy="interval", fsync_interval=1.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}'.")
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._active = None
+        self._active_path = None
+        self._last_fsync = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._next_sequence = max(
+            (self._sequence(name) for name in os.listdir(directory) if self._is_segment(name)),
+            default=0,
+        ) + 1
+
+    def append(self, rows):
+        """Append rows of (machine_name, topic, value, unit, timestamp) to the journal."""
+        lines = "".join(
+            json.dumps([machine, topic, value, unit, timestamp.isoformat()]) + "\n"
+            for machine, topic, value, unit, timestamp in rows
+        ).encode("utf-8")
+        with self._lock:
+            if self._active is None:
+                self._open_segment()
+            self._active.write(lines)
+            self._sync(force=self.fsync_policy == "always")
+            if self._active.tell() >= self.segment_max_bytes:
+                self._seal_active()
+
+    def seal(self):
+        """Seal the active segment so that its rows become available for replay."""
+        with self._lock:
+            if self._active is not None:
+                self._seal_active()
+
+    def sealed_segments(self):
+        """Return the paths of sealed segments, oldest first."""
+        with self._lock:
+            active = self._active_path
+        names = sorted(
+            (name for name in os.listdir(self.directory) if self._is_segment(name)),
+            key=self._sequence,
+        )
+        paths = [os.path.join(self.directory, name) for name in names]
+        return [path for path in paths if path != active]
+
+    def has_pending(self):
+        """Return True if any row is waiting in the journal."""
+        with self._lock:
+            if self._active is not None and self._active.tell() > 0:
+                return True
+        return bool(self.sealed_segments())
+
+    @staticmethod
+    def read_segment(path):
+        """Read the rows stored in a segment, skipping a torn trailing line."""
+        rows = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                try:
+                    machine, topic, value, unit, timestamp = json.loads(line)
+                except (ValueError, TypeError):
+                    logging.warning("Skipping corrupt line %d in spill segment %s.", line_number, path)
+                    continue
+                rows.append(
+                    (machine, topic, value, unit, datetime.datetime.fromisoformat(timestamp))
+                )
+        return rows
+
+    @staticmethod
+    def remove_segment(path):
+        """Delete a segment whose rows have been committed."""
+        os.remove(path)
+
+    def close(self):
+        """Flush and close the active segment."""
+        with self._lock:
+            if self._active is not None:
+                self._seal_active()
+
+    def _open_segment(self):
+        """Open a new active segment."""
+        name = f"{SEGMENT_PREFIX}{self._next_sequence:012d}{SEGMENT_SUFFIX}"
+        self._next_sequence += 1
+        self._active_path = os.path.join(self.directory, name)
+        self._active = open(self._active_path, "ab")  # pylint: disable=consider-using-with
+
+    def _seal_active(self):
+        """Sync and close the active segment, removing it if it is empty."""
+        self._sync(force=True)
+        empty = self._active.tell() == 0
+        self._active.close()
+        if empty:
+            os.remove(self._active_path)
+        self._active = None
+        self._active_path = None
+
+    def _sync(self, force=False):
+        """Flush the active segment and fsync it according to the policy."""
+        self._active.flush()
+        if self.fsync_policy == "never" and not force:
+            return
+        now = time.monotonic()
+        if force or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._active.fileno())
+            self._last_fsync = now
+
+    @staticmethod
+    def _is_segment(name):
+        return name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+
+    @staticmethod
+    def _sequence(name):
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+
+class SpillReplayer:
+    """
+    Background thread draining sealed journal segments into the database.
+
+    ``write_batch`` must persist a list of rows in one transaction and raise on failure,
+    so a segment is either fully committed or retried as a whole; rows the database
+    rejects individually are expected to be dropped by ``write_batch`` itself. ``healthy`` is set
+    while the database accepts writes and cleared by either side when a write fails
+    with one of ``unavailable_errors``.
+    """
+
+    def __init__(self, journal, write_batch, probe, healthy, interval, unavailable_errors):
+        self.journal = journal
+        self.write_batch = write_batch
+        self.probe = probe
+        self.healthy = healthy
+        self.interval = interval
+        self.unavailable_errors = unavailable_errors
+        self.rows_replayed = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the replayer thread."""
+        self._thread = threading.Thread(target=self._run, name="spill-replayer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the replayer thread."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        """Replay pending segments every interval until stopped."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.replay_pending()
+            except Exception:  # pylint: disable=broad-except
+                logging.exception("Unexpected error while replaying the spill journal.")
+
+    def replay_pending(self):
+        """Replay every pending segment, returning False if the database is still unavailable."""
+        if not self.healthy.is_set():
+            try:
+                self.probe()
+            except self.unavailable_errors:
+                return False
+            logging.info("Database is reachable again.")
+        if self.journal.has_pending():
+            self.journal.seal()
+            for path in self.journal.sealed_segments():
+                if self._stop_event.is_set():
+                    return False
+                if not self._replay_segment(path):
+                    self.healthy.clear()
+                    return False
+        self.healthy.set()
+        return True
+
+    def _replay_segment(self, path):
+        """Write a whole segment to the database and delete it afterwards."""
+        rows = self.journal.read_segment(path)
+        started = time.perf_counter()
+        try:
+            if rows:
+                self.write_batch(rows)
+        except self.unavailable_errors as exc:
+            logging.warning("Database still unavailable, keeping spill segment %s: %s", path, exc)
+            return False
+        except Exception:  # pylint: disable=broad-except
+            logging.exception("Spill segment %s was rejected by the database, quarantining it.", path)
+            os.replace(path, path + FAILED_SUFFIX)
+            return True
+        self.journal.remove_segment(path)
+        self.rows_replayed += len(rows)
+        logging.info(
+            "Replayed %d spilled rows from %s in %.1f ms.",
+            len(rows), os.path.basename(path), (time.perf_counter() - started) * 1000
+        )
+        return True
@@ -0,0 +1,79 @@
+"""
+Checkpoints of the simulator's generation state.
+
+The checkpoint is a JSON file ``{"saved_at": <iso>, "machines": {machine: {parameter:
+{"current": <value>, "history": [<oldest>, ..., <newest>]}}}}``. It is written to a
+temporary file and renamed over the previous checkpoint, so a crash mid-write never
+leaves a truncated file behind.
+"""
+
+import datetime
+import json
+import logging
+import os
+import time
+
+
+def save_checkpoint(path, machines):
+    """Atomically write the state of every machine to ``path``."""
+    checkpoint = {
+        "saved_at": datetime.datetime.utcnow().isoformat(),
+        "machines": machines,
+    }
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file, separators=(",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path):
+    """Return the machine states stored at ``path``, or an empty dict if there are none."""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logging.error("Could not read state checkpoint %s: %s", path, exc)
+        return {}
+    machines = checkpoint.get("machines") if isinstance(checkpoint, dict) else None
+    if not isinstance(machines, dict):
+        logging.error("State checkpoint %s has no machines. Ignoring it.", path)
+        return {}
+    logging.info(
+        "Loaded state of %d machines saved at %s from %s",
+        len(machines), checkpoint.get("saved_at"), path
+    )
+    return machines
+
+
+class StateCheckpointer:
+    """
+    Writes the simulator state at most once per interval.
+
+    :param path: Checkpoint file.
+    :param interval: Minimum number of seconds between two checkpoints.
+    :param snapshot: Callable returning the machine states to save.
+    """
+
+    def __init__(self, path, interval, snapshot, clock=time.monotonic):
+        self.path = path
+        self.interval = interval
+        self.snapshot = snapshot
+        self.clock = clock
+        self._last_saved = clock()
+
+    def maybe_save(self):
+        """Save a checkpoint if the interval has passed since the last one."""
+        if self.clock() - self._last_saved >= self.interval:
+            self.save()
+
+    def save(self):
+        """Save a checkpoint now, logging instead of raising on failure."""
+        self._last_saved = self.clock()
+        try:
+            save_checkpoint(self.path, self.snapshot())
+        except (OSError, TypeError, ValueError) as exc:
+            logging.error("Could not write state checkpoint %s: %s", self.path, exc)
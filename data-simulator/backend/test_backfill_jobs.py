@@ -0,0 +1,111 @@
+"""Tests for the persisted cursor of backfill jobs."""
+
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+
+from backfill_jobs import COMPLETED, FAILED, INTERRUPTED, BackfillJobManager  # type: ignore
+
+
+def chunk_runner(commits, fail_commit_at=None):
+    """Return a runner of three one-hour chunks of 10 rows that records its commits."""
+    def runner(job):
+        start = datetime.datetime.fromisoformat(job.resume_from)
+        end = datetime.datetime.fromisoformat(job.end_time)
+        while start < end:
+            start += datetime.timedelta(hours=1)
+
+            def commit(chunk_end=start):
+                if chunk_end == fail_commit_at:
+                    raise OSError("connection lost")
+                commits.append(chunk_end)
+            yield start.isoformat(), 10, commit
+    return runner
+
+
+def wait_finished(manager, job):
+    """Wait until a job has stopped running, then shut the manager down."""
+    deadline = time.monotonic() + 5.0
+    while job.status not in (COMPLETED, FAILED) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.shutdown()
+    return job
+
+
+def submit(manager):
+    """Submit a three-hour job and wait for it to stop."""
+    job = manager.submit("Drill", datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 1, 3),
+                         3600, 30)
+    return wait_finished(manager, job)
+
+
+def test_failed_commit_leaves_chunk_pending_and_resume_skips_committed_chunk(tmp_path):
+    commits = []
+    fail_at = datetime.datetime(2024, 1, 1, 2)
+    manager = BackfillJobManager(chunk_runner(commits, fail_at), lambda job: False, str(tmp_path), 1)
+    job = submit(manager)
+    assert job.status == FAILED
+    assert job.resume_from == "2024-01-01T01:00:00"
+    assert job.pending == {"resume_from": "2024-01-01T02:00:00", "rows": 10}
+    with open(os.path.join(tmp_path, f"{job.id}.json"), "r", encoding="utf-8") as file:
+        assert json.load(file)["pending"] == job.pending
+
+    # The commit reached the database although the connection was lost afterwards.
+    resumed = BackfillJobManager(chunk_runner(commits), lambda job: True, str(tmp_path), 1)
+    resumed.recover()
+    job = wait_finished(resumed, resumed.resume(job.id))
+    assert job.status == COMPLETED
+    assert job.rows_done == 30
+    assert commits == [datetime.datetime(2024, 1, 1, hour) for hour in (1, 3)]
+
+
+def test_uncommitted_pending_chunk_is_written_again(tmp_path):
+    commits = []
+    fail_at = datetime.datetime(2024, 1, 1, 2)
+    manager = BackfillJobManager(chunk_runner(commits, fail_at), lambda job: False, str(tmp_path), 1)
+    job = submit(manager)
+
+    resumed = BackfillJobManager(chunk_runner(commits), lambda job: False, str(tmp_path), 1)
+    resumed.recover()
+    job = wait_finished(resumed, resumed.resume(job.id))
+    assert job.status == COMPLETED
+    assert job.rows_done == 30
+    assert job.pending is None
+    assert commits == [datetime.datetime(2024, 1, 1, hour) for hour in (1, 2, 3)]
+
+
+EXIT_WHILE_RUNNING = """
+import atexit, datetime, sys, time
+from backfill_jobs import BackfillJobManager
+
+def slow_runner(job):
+    start = datetime.datetime.fromisoformat(job.resume_from)
+    while True:
+        time.sleep(0.05)
+        start += datetime.timedelta(hours=1)
+        yield start.isoformat(), 10, lambda: None
+
+manager = BackfillJobManager(slow_runner, lambda job: False, sys.argv[1], 1)
+atexit.register(manager.shutdown)
+job = manager.submit("Drill", datetime.datetime(2024, 1, 1), datetime.datetime(2025, 1, 1), 3600, 87840)
+print(job.id)
+time.sleep(0.3)
+"""
+
+
+def test_exit_interrupts_running_job(tmp_path):
+    started = time.monotonic()
+    result = subprocess.run(
+        [sys.executable, "-c", EXIT_WHILE_RUNNING, str(tmp_path)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, timeout=30, check=True,
+    )
+    assert time.monotonic() - started < 10
+    job_id = result.stdout.strip()
+    with open(os.path.join(tmp_path, f"{job_id}.json"), "r", encoding="utf-8") as file:
+        job = json.load(file)
+    assert job["status"] == INTERRUPTED
+    assert 0 < job["rows_done"] < 87840
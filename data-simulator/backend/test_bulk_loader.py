@@ -0,0 +1,43 @@
+"""
+Tests for rendering machine data into COPY text.
+"""
+
+import datetime
+
+import numpy as np
+
+from bulk_loader import format_copy_columns, format_copy_rows
+
+TIMESTAMPS = np.datetime64("2024-01-01T00:00:00", "us") + np.arange(3) * np.timedelta64(1500, "ms")
+VALUES = np.array([[1.25, 10.0, 7.5], [2.5, 20.0, 8.5], [np.nan, 30.0, 9.5]])
+COLUMNS = [(0, "ZG/drill/1/speed", "rpm"), (2, "ZG/drill/1/load %", None)]
+
+
+def parse(text):
+    """Return the COPY lines of a text as comparable field tuples."""
+    rows = []
+    for line in text.splitlines():
+        machine, topic, value, unit, timestamp = line.split("\t")
+        rows.append((machine, topic, float(value), unit, datetime.datetime.fromisoformat(timestamp)))
+    return rows
+
+
+def test_columns_render_like_rows():
+    rows = [
+        ("Drill\tA", topic, value[column], unit, timestamp)
+        for timestamp, value in zip(TIMESTAMPS.tolist(), VALUES.tolist())
+        for column, topic, unit in COLUMNS
+    ]
+    expected = parse(format_copy_rows(rows))
+    actual = parse(format_copy_columns("Drill\tA", COLUMNS, TIMESTAMPS, VALUES, "%.2f"))
+
+    assert len(actual) == 6
+    assert actual[0][:2] == ("Drill\\tA", "ZG/drill/1/speed")
+    assert actual[1][3] == "\\N"
+    for got, want in zip(actual, expected):
+        assert got[:2] + got[3:] == want[:2] + want[3:]
+        assert got[2] == want[2] or (np.isnan(got[2]) and np.isnan(want[2]))
+
+
+def test_empty_chunk_renders_nothing():
+    assert format_copy_columns("Drill", [], TIMESTAMPS, VALUES) == ""
@@ -0,0 +1,40 @@
+"""
+Tests for the MQTT capture log.
+"""
+
+import os
+
+from mqtt_capture import CaptureWriter, read_log
+
+
+def write_log(path, messages):
+    """Write (epoch, topic, payload) messages into a capture log."""
+    writer = CaptureWriter(path)
+    for epoch, topic, payload in messages:
+        writer.append(epoch, topic, payload, qos=1, retain=topic.endswith("state"))
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "traffic.log")
+    write_log(path, [(1.5, "ZG/a/speed", b"10"), (2.5, "ZG/a/state", b"on")])
+    assert list(read_log(path)) == [
+        (1.5, "ZG/a/speed", b"10", 1, False),
+        (2.5, "ZG/a/state", b"on", 1, True),
+    ]
+
+
+def test_continuing_after_a_torn_tail_keeps_the_log_readable(tmp_path):
+    path = str(tmp_path / "traffic.log")
+    write_log(path, [(1.0, "ZG/a/speed", b"10"), (2.0, "ZG/b/speed", b"20")])
+    # A crash in the middle of writing the last message.
+    with open(path, "r+b") as file:
+        file.truncate(os.path.getsize(path) - 1)
+
+    write_log(path, [(3.0, "ZG/b/speed", b"30"), (4.0, "ZG/c/speed", b"40")])
+
+    assert list(read_log(path)) == [
+        (1.0, "ZG/a/speed", b"10", 1, False),
+        (3.0, "ZG/b/speed", b"30", 1, False),
+        (4.0, "ZG/c/speed", b"40", 1, False),
+    ]
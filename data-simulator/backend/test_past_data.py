@@ -0,0 +1,44 @@
+"""
+Tests for past data generation and streaming.
+"""
+
+import datetime
+import json
+from unittest import mock
+
+import psycopg2  # type: ignore
+import pytest
+
+import past_data
+
+ROW = ("DrillingMachine", "ZG/drilling/PLC/1/speed", 1000.0, "rpm",
+       datetime.datetime(2024, 1, 1))
+
+
+def failing_chunks():
+    """Yield one chunk of rows, then fail like a lost database connection."""
+    yield [ROW]
+    raise psycopg2.OperationalError("server closed the connection\nunexpectedly")
+
+
+@pytest.mark.parametrize("output_format", ["csv", "ndjson"])
+def test_stream_ends_with_error_record_when_storing_fails(output_format):
+    chunks = failing_chunks()
+    lines = "".join(
+        past_data.stream_past_data(chunks, next(chunks), output_format)
+    ).splitlines()
+    if output_format == "csv":
+        assert lines[0] == ",".join(past_data.PAST_DATA_CSV_FIELDS)
+        assert lines[-1] == "# error: server closed the connection unexpectedly"
+    else:
+        assert json.loads(lines[0])["value"] == 1000.0
+        assert json.loads(lines[-1]) == {"error": "server closed the connection\nunexpectedly"}
+
+
+def test_generate_past_data_raises_when_storing_fails():
+    with mock.patch.object(past_data, "iter_past_data", return_value=failing_chunks()):
+        with pytest.raises(psycopg2.Error):
+            past_data.generate_past_data(
+                "DrillingMachine", datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 2),
+                60, {},
+            )
@@ -0,0 +1,56 @@
+"""
+Tests for encoding and decoding per-machine frames.
+"""
+
+import datetime
+
+import pytest
+
+from machine_registry import compile_registry
+from payload_frames import FrameDecodeError, decode_frame, encode_frame
+
+MACHINE_TYPES = {
+    "DrillingMachine": {
+        "id": 1,
+        "parameters": [
+            {"parameter": "DrillingSpeed", "topic": "ZG/drilling/PLC/1/speed", "unit": "rpm"},
+            {"parameter": "Torque", "topic": "ZG/drilling/PLC/1/torque", "unit": "kNm"},
+        ],
+    },
+}
+PARAMETER_RANGES = {"DrillingMachine": {"DrillingSpeed": (200, 6000), "Torque": (2, 40)}}
+TIMESTAMP = datetime.datetime(2024, 1, 1, 12, 0, 0, 250000)
+
+
+@pytest.fixture(name="entry")
+def entry_fixture():
+    return compile_registry(MACHINE_TYPES, PARAMETER_RANGES).machine("DrillingMachine")
+
+
+@pytest.mark.parametrize("frame_format", ["json", "binary"])
+def test_frame_round_trip(entry, frame_format):
+    payload = encode_frame(
+        entry, {"DrillingSpeed": 3020.33, "Torque": 20.76}, TIMESTAMP, frame_format, seq=7
+    )
+    seq, rows = decode_frame(entry, payload)
+
+    assert seq == 7
+    assert rows == [
+        ("DrillingMachine", "ZG/drilling/PLC/1/speed", 3020.33, "rpm", TIMESTAMP),
+        ("DrillingMachine", "ZG/drilling/PLC/1/torque", 20.76, "kNm", TIMESTAMP),
+    ]
+
+
+@pytest.mark.parametrize("frame_format", ["json", "binary"])
+def test_missing_parameters_are_left_out(entry, frame_format):
+    payload = encode_frame(entry, {"Torque": 20.76}, TIMESTAMP, frame_format)
+    _, rows = decode_frame(entry, payload)
+
+    assert [row[1] for row in rows] == ["ZG/drilling/PLC/1/torque"]
+
+
+def test_truncated_binary_frame_is_rejected(entry):
+    payload = encode_frame(entry, {"DrillingSpeed": 1.0, "Torque": 2.0}, TIMESTAMP, "binary")
+
+    with pytest.raises(FrameDecodeError):
+        decode_frame(entry, payload[:-1])
@@ -0,0 +1,40 @@
+"""Tests for the per-topic sequence tracking."""
+
+from sequencing import SequenceTracker  # type: ignore
+
+
+def topic_stats(tracker):
+    """Return the counters of the only tracked topic."""
+    return tracker.stats(include_topics=True)["per_topic"]["ZG/a"]
+
+
+def test_new_session_starts_a_new_epoch():
+    tracker = SequenceTracker()
+    for seq in range(10):
+        tracker.observe("ZG/a", seq, None, 0.0, "first")
+    for seq in range(3):
+        tracker.observe("ZG/a", seq, None, 0.0, "second")
+    stats = topic_stats(tracker)
+    assert stats["resets"] == 1
+    assert stats["duplicates"] == 0
+    assert stats["reordered"] == 0
+    assert stats["highest_seq"] == 2
+
+
+def test_sequence_zero_without_session_starts_a_new_epoch():
+    tracker = SequenceTracker()
+    for seq in (0, 1, 2, 3, 0, 1):
+        tracker.observe("ZG/a", seq, None, 0.0)
+    stats = topic_stats(tracker)
+    assert stats["resets"] == 1
+    assert stats["duplicates"] == 0
+
+
+def test_duplicate_within_a_session_is_counted():
+    tracker = SequenceTracker()
+    for seq in (0, 1, 2, 1, 4):
+        tracker.observe("ZG/a", seq, None, 0.0, "first")
+    stats = topic_stats(tracker)
+    assert stats["duplicates"] == 1
+    assert stats["missing"] == 1
+    assert stats["resets"] == 0
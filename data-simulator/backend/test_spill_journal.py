@@ -0,0 +1,79 @@
+"""
+Tests for the spill journal and its replayer.
+"""
+
+import datetime
+import os
+import threading
+
+from spill_journal import FAILED_SUFFIX, SpillJournal, SpillReplayer
+
+ROWS = [
+    ("DrillingMachine", "ZG/drilling/PLC/1/speed", 3020.33, "rpm",
+     datetime.datetime(2024, 1, 1, 12, 0, 0)),
+    ("DrillingMachine", "ZG/drilling/PLC/1/torque", 20.76, "kNm",
+     datetime.datetime(2024, 1, 1, 12, 0, 0, 500000)),
+]
+
+
+class Unavailable(Exception):
+    """Stand-in for a database connection error."""
+
+
+def make_replayer(journal, write_batch):
+    healthy = threading.Event()
+    healthy.set()
+    return SpillReplayer(journal, write_batch, lambda: None, healthy, 1.0, (Unavailable,))
+
+
+def test_spilled_rows_are_replayed_and_removed(tmp_path):
+    journal = SpillJournal(str(tmp_path), 1024 * 1024, fsync_policy="never")
+    journal.append(ROWS[:1])
+    journal.append(ROWS[1:])
+    written = []
+    replayer = make_replayer(journal, written.extend)
+
+    assert replayer.replay_pending()
+    assert written == ROWS
+    assert replayer.rows_replayed == 2
+    assert not journal.has_pending()
+    assert not os.listdir(tmp_path)
+
+
+def test_segment_is_kept_while_the_database_is_unavailable(tmp_path):
+    journal = SpillJournal(str(tmp_path), 1024 * 1024, fsync_policy="never")
+    journal.append(ROWS)
+
+    def unavailable(_rows):
+        raise Unavailable("down")
+
+    replayer = make_replayer(journal, unavailable)
+    assert not replayer.replay_pending()
+    assert not replayer.healthy.is_set()
+    assert [SpillJournal.read_segment(path) for path in journal.sealed_segments()] == [ROWS]
+
+
+def test_rejected_segment_is_quarantined(tmp_path):
+    journal = SpillJournal(str(tmp_path), 1024 * 1024, fsync_policy="never")
+    journal.append(ROWS)
+
+    def reject(_rows):
+        raise ValueError("rejected")
+
+    replayer = make_replayer(journal, reject)
+    journal.seal()
+    segment = journal.sealed_segments()[0]
+    assert replayer.replay_pending()
+    assert os.path.exists(segment + FAILED_SUFFIX)
+    assert not journal.has_pending()
+
+
+def test_torn_trailing_line_is_skipped(tmp_path):
+    journal = SpillJournal(str(tmp_path), 1024 * 1024, fsync_policy="never")
+    journal.append(ROWS)
+    journal.seal()
+    segment = journal.sealed_segments()[0]
+    with open(segment, "ab") as file:
+        file.write(b'["DrillingMachine", "ZG/dri')
+
+    assert SpillJournal.read_segment(segment) == ROWS
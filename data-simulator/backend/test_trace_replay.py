@@ -0,0 +1,67 @@
+"""
+Tests for importing and replaying recorded traces.
+"""
+
+from machine_registry import compile_registry
+from trace_replay import TraceFile, TraceReplay, import_csv
+
+MACHINE_TYPES = {
+    "DrillingMachine": {
+        "id": 1,
+        "parameters": [
+            {"parameter": "DrillingSpeed", "topic": "ZG/drilling/PLC/1/speed", "unit": "rpm"},
+            {"parameter": "Torque", "topic": "ZG/drilling/PLC/1/torque", "unit": "kNm"},
+        ],
+    },
+}
+PARAMETER_RANGES = {"DrillingMachine": {"DrillingSpeed": (200, 6000), "Torque": (2, 40)}}
+
+# One row per parameter, each parameter recorded at its own instant.
+ONE_ROW_PER_PARAMETER = """timestamp,machine_name,topic,value
+2024-01-01T00:00:00,DrillingMachine,ZG/drilling/PLC/1/speed,1000
+2024-01-01T00:00:01,DrillingMachine,ZG/drilling/PLC/1/torque,10
+2024-01-01T00:00:02,DrillingMachine,ZG/drilling/PLC/1/speed,2000
+2024-01-01T00:00:03,DrillingMachine,ZG/drilling/PLC/1/torque,20
+"""
+
+
+def import_trace(tmp_path, text):
+    """Import CSV text into a trace file and open it."""
+    csv_path = tmp_path / "recorded.csv"
+    csv_path.write_text(text, encoding="utf-8")
+    trace_path = tmp_path / "machines.trace"
+    import_csv(str(csv_path), str(trace_path))
+    return TraceFile(str(trace_path))
+
+
+def test_one_row_per_parameter_export_replays_every_parameter(tmp_path):
+    trace = import_trace(tmp_path, ONE_ROW_PER_PARAMETER)
+    replay = TraceReplay(trace, loop=False)
+    registry = compile_registry(MACHINE_TYPES, PARAMETER_RANGES)
+
+    assert trace.records == 4
+    assert replay.values(registry, ["DrillingMachine"], 0.0) == {
+        "DrillingMachine": {"DrillingSpeed": 1000.0}
+    }
+    assert replay.values(registry, ["DrillingMachine"], 1.0) == {
+        "DrillingMachine": {"DrillingSpeed": 1000.0, "Torque": 10.0}
+    }
+    assert replay.values(registry, ["DrillingMachine"], 2.0) == {
+        "DrillingMachine": {"DrillingSpeed": 2000.0, "Torque": 10.0}
+    }
+    assert replay.values(registry, ["DrillingMachine"], 3.0) == {
+        "DrillingMachine": {"DrillingSpeed": 2000.0, "Torque": 20.0}
+    }
+
+
+def test_rows_of_the_same_instant_form_one_record(tmp_path):
+    trace = import_trace(tmp_path, """timestamp,machine_name,topic,value
+2024-01-01T00:00:00,DrillingMachine,ZG/drilling/PLC/1/speed,1000
+2024-01-01T01:00:00+01:00,DrillingMachine,ZG/drilling/PLC/1/torque,10
+1704067260,DrillingMachine,ZG/drilling/PLC/1/speed,2000
+""")
+
+    assert trace.records == 2
+    assert trace.duration == 60.0
+    assert trace.sample([0, 1], trace.start).tolist() == [1000.0, 10.0]
+    assert trace.sample([0, 1], trace.start + 60.0).tolist() == [2000.0, 10.0]
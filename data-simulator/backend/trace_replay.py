@@ -0,0 +1,294 @@
+"""
+Trace-driven generation from recorded machine data in a memory-mapped columnar file.
+
+Run ``python trace_replay.py import recorded.csv machines.trace`` once to convert a
+CSV export of machine_data (timestamp, machine_name, topic and value columns; parameter
+and unit optional; sorted by timestamp) into a trace file. Rows of the same instant
+become one record, and every topic becomes one column. A topic without a row in a
+record holds its previous value, so exports with one row per parameter replay every
+parameter at every record.
+
+Trace file layout, little endian:
+
+- magic ``ZGTRACE1`` and the uint32 length of a JSON header holding the record count
+  and the (machine, parameter, topic, unit) of every column
+- padding up to a multiple of 8 bytes
+- one float64 epoch timestamp per record
+- per column, one float32 value per record, NaN before the topic's first value
+
+The file is memory-mapped and never loaded as a whole, so traces far larger than RAM
+replay from the page cache. Replay maps each registry topic onto the trace column of
+the same topic. It starts at an offset into the trace, loops or holds the last record
+at the end, and either holds each record until the next one or interpolates linearly
+between them.
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import logging
+import struct
+
+import numpy as np
+
+from payload_frames import to_epoch  # type: ignore
+
+TRACE_MAGIC = b"ZGTRACE1"
+HEADER_LENGTH = struct.Struct("<I")
+TIMESTAMP_DTYPE = np.dtype("<f8")
+VALUE_DTYPE = np.dtype("<f4")
+IMPORT_CHUNK_RECORDS = 65536
+
+
+class TraceFormatError(ValueError):
+    """Exception raised for files and CSV input that are not valid traces."""
+
+
+def _data_offset(header_length):
+    """Return the offset of the timestamp column, aligned to 8 bytes."""
+    offset = len(TRACE_MAGIC) + HEADER_LENGTH.size + header_length
+    return offset + (-offset % 8)
+
+
+def _parse_timestamp(text):
+    """Parse a CSV timestamp given as epoch seconds or an ISO timestamp, naive meaning UTC."""
+    try:
+        return float(text)
+    except ValueError:
+        timestamp = datetime.datetime.fromisoformat(text)
+    return timestamp.timestamp() if timestamp.tzinfo is not None else to_epoch(timestamp)
+
+
+def _iter_csv_records(csv_path):
+    """Yield (epoch, [(topic, value, row), ...]) for each run of rows of the same instant."""
+    with open(csv_path, "r", encoding="utf-8", newline="") as file:
+        reader = csv.DictReader(file)
+        missing = {"timestamp", "machine_name", "topic", "value"} - set(reader.fieldnames or ())
+        if missing:
+            raise TraceFormatError(f"CSV is missing the columns {sorted(missing)}.")
+        epoch, record = None, []
+        for row in reader:
+            row_epoch = _parse_timestamp(row["timestamp"])
+            if row_epoch != epoch:
+                if record:
+                    yield epoch, record
+                epoch, record = row_epoch, []
+            try:
+                value = float(row["value"])
+            except ValueError:
+                value = float("nan")
+            record.append((row["topic"], value, row))
+        if record:
+            yield epoch, record
+
+
+def import_csv(csv_path, trace_path):
+    """
+    Convert a CSV export into a trace file in two streaming passes.
+
+    The first pass collects the columns and counts the records, the second writes
+    them through a memory map a chunk at a time, so memory use does not depend on the
+    size of the CSV. Every column is forward-filled: a record without a value for a
+    topic holds the topic's last value.
+
+    :return: Number of records written.
+    :raises TraceFormatError: If the CSV lacks required columns, is not sorted by
+        timestamp or holds no rows.
+    """
+    columns = {}
+    records = 0
+    previous = None
+    for epoch, record in _iter_csv_records(csv_path):
+        if previous is not None and epoch <= previous:
+            raise TraceFormatError("CSV rows must be sorted by timestamp.")
+        previous = epoch
+        records += 1
+        for topic, _, row in record:
+            if topic not in columns:
+                columns[topic] = {
+                    "machine": row["machine_name"],
+                    "parameter": row.get("parameter") or topic.rsplit("/", 1)[-1],
+                    "topic": topic,
+                    "unit": row.get("unit") or "",
+                }
+    if not records:
+        raise TraceFormatError("CSV holds no rows.")
+
+    header = json.dumps({"records": records, "columns": list(columns.values())}).encode("utf-8")
+    offset = _data_offset(len(header))
+    with open(trace_path, "wb") as file:
+        file.write(TRACE_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+        file.write(b"\0" * (offset - file.tell()))
+        file.truncate(offset + records * (TIMESTAMP_DTYPE.itemsize + len(columns) * VALUE_DTYPE.itemsize))
+
+    index = {topic: column for column, topic in enumerate(columns)}
+    timestamps = np.memmap(trace_path, TIMESTAMP_DTYPE, "r+", offset, (records,))
+    values = np.memmap(
+        trace_path, VALUE_DTYPE, "r+", offset + timestamps.nbytes, (len(columns), records)
+    )
+    chunk_timestamps = np.empty(IMPORT_CHUNK_RECORDS, TIMESTAMP_DTYPE)
+    chunk_values = np.empty((len(columns), IMPORT_CHUNK_RECORDS), VALUE_DTYPE)
+    latest = np.full(len(columns), np.nan, VALUE_DTYPE)
+    written = filled = 0
+    for epoch, record in _iter_csv_records(csv_path):
+        chunk_timestamps[filled] = epoch
+        for topic, value, _ in record:
+            if value == value:  # not NaN
+                latest[index[topic]] = value
+        chunk_values[:, filled] = latest
+        filled += 1
+        if filled == IMPORT_CHUNK_RECORDS:
+            timestamps[written:written + filled] = chunk_timestamps
+            values[:, written:written + filled] = chunk_values
+            written, filled = written + filled, 0
+    timestamps[written:written + filled] = chunk_timestamps[:filled]
+    values[:, written:written + filled] = chunk_values[:, :filled]
+    timestamps.flush()
+    values.flush()
+    logging.info("Imported %d records of %d topics into %s.", records, len(columns), trace_path)
+    return records
+
+
+class TraceFile:
+    """Read-only memory map of a trace file."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            if file.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+                raise TraceFormatError(f"{path} is not a trace file.")
+            (header_length,) = HEADER_LENGTH.unpack(file.read(HEADER_LENGTH.size))
+            header = json.loads(file.read(header_length))
+        offset = _data_offset(header_length)
+        self.path = path
+        self.records = header["records"]
+        self.columns = header["columns"]
+        self.timestamps = np.memmap(path, TIMESTAMP_DTYPE, "r", offset, (self.records,))
+        self.values = np.memmap(
+            path, VALUE_DTYPE, "r", offset + self.timestamps.nbytes,
+            (len(self.columns), self.records),
+        )
+        self.topics = {column["topic"]: index for index, column in enumerate(self.columns)}
+        self.start = float(self.timestamps[0])
+        self.duration = float(self.timestamps[-1]) - self.start
+
+    def sample(self, columns, trace_time, interpolate=False):
+        """
+        Return the values of some columns at a time within the trace.
+
+        Without interpolation the latest record at or before ``trace_time`` is held;
+        with it, values are interpolated linearly towards the next record, falling back
+        to whichever neighbour has a value.
+        """
+        index = max(0, int(np.searchsorted(self.timestamps, trace_time, side="right")) - 1)
+        current = self.values[columns, index].astype(np.float64)
+        if not interpolate or index + 1 >= self.records:
+            return current
+        before, after = self.timestamps[index], self.timestamps[index + 1]
+        weight = min(1.0, max(0.0, (trace_time - before) / (after - before)))
+        following = self.values[columns, index + 1].astype(np.float64)
+        blended = current + weight * (following - current)
+        return np.where(np.isnan(blended), np.where(np.isnan(current), following, current), blended)
+
+
+class TraceReplay:
+    """
+    Replays a trace onto registry machines.
+
+    :param trace: TraceFile to replay.
+    :param offset: Seconds into the trace at which replay starts.
+    :param loop: Start over at the end of the trace instead of holding its last record.
+    :param interpolate: Interpolate between records instead of holding each one.
+    :param topic_map: Optional {registry topic: trace topic} for topics recorded under
+        another name.
+    """
+
+    def __init__(self, trace, offset=0.0, loop=True, interpolate=False, topic_map=None):
+        self.trace = trace
+        self.offset = offset
+        self.loop = loop
+        self.interpolate = interpolate
+        self.topic_map = topic_map or {}
+        self._mapping = {}
+        self._mapping_version = None
+
+    def trace_time(self, elapsed):
+        """Return the trace timestamp replayed ``elapsed`` seconds after replay started."""
+        position = self.offset + elapsed
+        if self.loop and self.trace.duration > 0:
+            position %= self.trace.duration
+        return self.trace.start + min(max(position, 0.0), self.trace.duration)
+
+    def values(self, registry, machines, elapsed):
+        """
+        Return {machine: {parameter: value}} of the given machines' traced parameters.
+
+        Parameters without a trace column, or without a value at this point of the
+        trace, are left out.
+        """
+        self._update_mapping(registry)
+        machine_columns = [
+            (machine, self._mapping[machine]) for machine in machines if self._mapping.get(machine)
+        ]
+        if not machine_columns:
+            return {}
+        columns = [column for _, mapped in machine_columns for _, column in mapped]
+        sampled = np.round(
+            self.trace.sample(columns, self.trace_time(elapsed), self.interpolate), 2
+        ).tolist()
+        result = {}
+        position = 0
+        for machine, mapped in machine_columns:
+            values = {}
+            for parameter, _ in mapped:
+                value = sampled[position]
+                position += 1
+                if value == value:  # not NaN
+                    values[parameter] = value
+            result[machine] = values
+        return result
+
+    def _update_mapping(self, registry):
+        """Map every registry parameter to its trace column after registry changes."""
+        if registry.version == self._mapping_version:
+            return
+        self._mapping = {}
+        for machine, entry in registry.machines.items():
+            mapped = []
+            for parameter in entry.parameters:
+                topic = self.topic_map.get(parameter.topic, parameter.topic)
+                if topic in self.trace.topics:
+                    mapped.append((parameter.parameter, self.trace.topics[topic]))
+            self._mapping[machine] = mapped
+        self._mapping_version = registry.version
+        logging.info(
+            "Trace %s covers %d of the registry's machines.",
+            self.trace.path, sum(1 for mapped in self._mapping.values() if mapped)
+        )
+
+
+def main():
+    """Parse the command line and import or describe a trace."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="convert a CSV export into a trace file")
+    import_parser.add_argument("csv_path")
+    import_parser.add_argument("trace_path")
+    info_parser = commands.add_parser("info", help="describe a trace file")
+    info_parser.add_argument("trace_path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    if args.command == "import":
+        import_csv(args.csv_path, args.trace_path)
+        return
+    trace = TraceFile(args.trace_path)
+    logging.info(
+        "%s: %d records of %d topics over %.0f s starting %s.",
+        trace.path, trace.records, len(trace.columns), trace.duration,
+        datetime.datetime.fromtimestamp(trace.start, datetime.timezone.utc).isoformat(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,13 +11,15 @@ import requests
 
 import machines_configuration
 import broker_configuration
+from simulator_configuration import CONFIG_FILE
 
 SUCCESS = "Success"
 ERROR = "Error"
 WARNING = "Warning"
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.json")
+BACKFILL_JOBS_URL = "http://localhost:5000/backfill-jobs"
+BACKFILL_POLL_MS = 2000
 
 
 class BrokerConfigurationSection:
@@ -531,6 +533,7 @@ class MachinesConfigurationSection:
         machines_configuration.save_parameter_ranges()
         with open(CONFIG_FILE, 'w', encoding='utf-8') as config_file:
             json.dump(machines_configuration.MACHINE_TYPES, config_file, indent=4)
+        machines_configuration.notify_config_changed()
         messagebox.showinfo(
             "Info", "Machine configurations and parameter ranges saved successfully."
         )
@@ -854,7 +857,7 @@ class PastDataGeneratorSection:
 
         try:
             response = requests.post(
-                "http://localhost:5000/generate-past-data",
+                BACKFILL_JOBS_URL,
                 json={
                     "machine_name": machine_name,
                     "start_date": start_date,
@@ -864,14 +867,13 @@ class PastDataGeneratorSection:
                 timeout=10  # Add a timeout of 10 seconds
             )
             response_data = response.json()
-            if response.status_code == 200:
-                generated_data = response_data.get("generated_data", [])
-                display_data = "\n".join([
-                    f"{data['timestamp']} - {data['parameter']} ({data['topic']}): "
-                    f"{data['value']} {data['unit']}"
-                    for data in generated_data
-                ])
-                messagebox.showinfo(SUCCESS, f"Past data generated successfully!\n\n{display_data}")
+            if response.status_code == 202:
+                messagebox.showinfo(
+                    SUCCESS,
+                    f"Past data generation started (job {response_data['id']}, "
+                    f"{response_data['rows_total']} rows)."
+                )
+                self.parent.after(BACKFILL_POLL_MS, self.poll_job, response_data["id"])
             else:
                 messagebox.showerror(ERROR, response_data.get("error", "Unknown error occurred"))
         except requests.Timeout:
@@ -879,6 +881,31 @@ class PastDataGeneratorSection:
         except requests.RequestException as e:
             messagebox.showerror(ERROR, f"Request failed: {str(e)}")
 
+    def poll_job(self, job_id):
+        """Checks a past data job until it finishes and reports its outcome."""
+        try:
+            response = requests.get(f"{BACKFILL_JOBS_URL}/{job_id}", timeout=10)
+            job = response.json()
+        except (requests.RequestException, ValueError):
+            self.parent.after(BACKFILL_POLL_MS, self.poll_job, job_id)
+            return
+        if response.status_code != 200:
+            messagebox.showerror(ERROR, job.get("error", "Unknown error occurred"))
+        elif job["status"] == "completed":
+            messagebox.showinfo(
+                SUCCESS,
+                f"Past data generated successfully for {job['machine_name']}: "
+                f"{job['rows_done']} rows."
+            )
+        elif job["status"] in ("failed", "cancelled", "interrupted"):
+            messagebox.showerror(
+                ERROR,
+                f"Past data job {job_id} {job['status']} after {job['rows_done']} rows. "
+                f"{job.get('error') or ''}"
+            )
+        else:
+            self.parent.after(BACKFILL_POLL_MS, self.poll_job, job_id)
+
 
 class ControlButtonsSection:
     """Handles the creation and logic of the control buttons in the UI."""